@@ -1,416 +1,975 @@
-from flask import Flask, request, render_template, jsonify
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
+from flask import Flask, Response, request, render_template, jsonify, session, stream_with_context, get_template_attribute
 from datetime import datetime, timedelta
 import json
 import os
 import logging
 import time
-import shutil
 import threading 
-from twilio.rest import Client
+import atexit
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from driver_pool import DriverPool, DriverPoolTimeout, resolve_driver_path, create_driver
+from parallel_search import run_tasks, iter_tasks
+from shared_state import (Watchlist, LastSearches, SharedStore, SharedWatchlist, SharedLastSearches,
+                          SharedQueryLog, LeaderLock, run_as_leader)
+from async_monitor import MonitorService, SeatChangeEvent, StubSmsSender, TwilioSmsSender
+from monitor_scheduler import MonitorScheduler, group_selected_flights, departure_datetime, interval_for
+from page_readiness import wait_until, results_ready, network_idle
+from flight_cache import FlightCache
+from flight_model import Flight
+from refresh_workers import RefreshWorkers
+from single_flight import SingleFlight
+from flight_keys import selected_flight_key, canonical_key, split_flight_key, SnapshotIndex, MISSING_CODES
+from search_params import (SearchTask, DEFAULT_PASSENGERS, parse_routes, make_passengers, task_key,
+                           results_query, build_search_tasks)
+from snapshot_diff import diff_snapshots, describe, REMOVED
+from prewarm import Prewarmer, QueryLog, parse_hours
+from flight_store import FlightStore
+from flight_parser import find_cards, parse_cards, parse_flight_cards, DEAL_URL
+from http_engine import HttpEngine, FastPathFailed
+from debug_capture import DebugCaptures
+from metrics import REGISTRY, CACHE_REQUESTS, SCRAPES_COALESCED, timed, timed_into, record_scrape, engine_stats, sampled
 
 app = Flask(__name__)
+app.secret_key = os.environ.get('FLASK_SECRET_KEY') or os.urandom(24)
 
 # הגדרת לוגים
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-CACHE_FILE = 'flight_cache.json'
+# חלק מהבקשות שבהן נרשמים ללוג נתוני הטיסות המלאים (ב-DEBUG בלבד)
+PAYLOAD_LOG_SAMPLE = float(os.environ.get('PAYLOAD_LOG_SAMPLE', 0.01))
+
+CACHE_FILE = os.environ.get('CACHE_FILE', 'flight_cache.json')
 CACHE_DURATION = timedelta(hours=24)
-SELECTED_FLIGHTS = {}
+# אחרי CACHE_SOFT_TTL הנתונים עדיין מוגשים, אבל מתרעננים ברקע; אחרי CACHE_DURATION הם נזרקים
+CACHE_SOFT_TTL = timedelta(minutes=float(os.environ.get('CACHE_SOFT_TTL_MINUTES', 30)))
+CACHE_REFRESH_WORKERS = int(os.environ.get('CACHE_REFRESH_WORKERS', 1))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 5000))
+CACHE_FLUSH_INTERVAL = float(os.environ.get('CACHE_FLUSH_INTERVAL', 5))
+FLIGHT_DB_FILE = os.environ.get('FLIGHT_DB_FILE', 'flights.db')
+# אפשר להפנות לשרת מקומי (למשל שרת הפיקסצ'רים של benchmarks/) במקום לאתר האמיתי
+ISRAIR_BASE_URL = os.environ.get('ISRAIR_BASE_URL', 'https://www.israir.co.il').rstrip('/')
+# המסלולים שהתהליך משרת (כל אחד בשני הכיוונים), למשל "ETM-TLV,ETM-HFA"; הראשון הוא ברירת המחדל בטופס
+ROUTES = parse_routes(os.environ.get('ROUTES', 'ETM-TLV'))
+# שמות הפרמטרים של מספר הנוסעים בכתובת התוצאות (results_query) עוד לא אומתו מול האתר; אם הוא
+# מתעלם מהם, חיפוש עם כמה נוסעים יקבל (וישמור בקאש ובמעקב) מחירים של נוסע אחד. עד שיאומתו -
+# רק מבוגר אחד; PASSENGER_COUNTS=1 מפעיל את שדות המבוגרים/ילדים/תינוקות
+PASSENGER_COUNTS_ENABLED = os.environ.get('PASSENGER_COUNTS', '0') == '1'
 LAST_RUN_TIME = None
 
+# 'memory' לתהליך יחיד; 'sqlite' משתף את רשימת המעקב והחיפושים האחרונים בין עובדי gunicorn
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+STATE_DB_FILE = os.environ.get('STATE_DB_FILE', 'state.db')
+WATCHLIST_FILE = os.environ.get('WATCHLIST_FILE', 'watchlist.json')
+# רק התהליך שמחזיק בנעילה מריץ את המעקב ואת חימום הקאש, כדי שלא יגרדו פעמיים
+MONITOR_LOCK_FILE = os.environ.get('MONITOR_LOCK_FILE', 'monitor.lock')
+MONITOR_LEADER_RETRY = 10
+
 # הגדרות Twilio לשליחת SMS
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
 USER_PHONE_NUMBER = os.environ.get('USER_PHONE_NUMBER')
 ENABLE_SMS = False
+# 'twilio' לשליחה אמיתית, 'stub' לשולח מקומי שרק רושם ללוג (לבדיקות בלי רשת)
+SMS_BACKEND = os.environ.get('SMS_BACKEND', 'twilio')
+
+_twilio_sender = None
+_twilio_lock = threading.Lock()
 
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+def twilio_sender():
+    """הלקוח של Twilio (והספרייה עצמה) נוצרים רק בשליחה הראשונה"""
+    global _twilio_sender
+    with _twilio_lock:
+        if _twilio_sender is None:
+            from twilio.rest import Client
+            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+            _twilio_sender = TwilioSmsSender(client, TWILIO_PHONE_NUMBER, USER_PHONE_NUMBER)
+        return _twilio_sender
 
-def setup_driver(headless=False):
+# מאגר דרייברים חמים לגרידה (headless) ולהזמנה (עם חלון)
+DRIVER_POOL_SIZE = int(os.environ.get('DRIVER_POOL_SIZE', 3))
+DRIVER_MAX_USES = int(os.environ.get('DRIVER_MAX_USES', 50))
+DRIVER_ACQUIRE_TIMEOUT = 60
+SCRAPE_DRIVER_POOL = DriverPool(size=DRIVER_POOL_SIZE, headless=True, max_uses=DRIVER_MAX_USES)
+# דפדפן ההזמנה (עם חלון) נפתח מראש על האתר, כך שהזמנה לא מחכה לעליית Chrome ולחיבור הראשון.
+# כבוי כברירת מחדל (בשרת בלי מסך אין איפה לפתוח חלון); כשמופעל - רק בתהליך שמחזיק בנעילת המעקב
+BOOKING_PREWARM = os.environ.get('BOOKING_PREWARM', '0') == '1'
+
+def create_booking_driver():
+    driver = create_driver(headless=False)
     try:
-        driver_path = ChromeDriverManager().install()
-        logger.debug(f"נתיב ה-ChromeDriver שנמצא: {driver_path}")
-        
-        if not os.path.exists(driver_path):
-            logger.error(f"הקובץ {driver_path} לא נמצא!")
-            raise Exception(f"ChromeDriver לא נמצא בנתיב: {driver_path}")
-        
-        if not os.access(driver_path, os.X_OK):
-            logger.warning(f"אין הרשאות הפעלה ל-{driver_path}, מתקן...")
-            os.chmod(driver_path, 0o755)
-        
-        service = Service(executable_path=driver_path)
-        options = webdriver.ChromeOptions()
-        if headless:
-            options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36')
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.maximize_window()
-        logger.debug("ChromeDriver נטען בהצלחה")
-        return driver
+        driver.get(ISRAIR_BASE_URL)
     except Exception as e:
-        logger.error(f"שגיאה בהגדרת ChromeDriver: {str(e)}")
-        raise
+        logger.warning(f"טעינת האתר בדפדפן ההזמנה נכשלה: {str(e)}")
+    return driver
+
+BOOKING_DRIVER_POOL = DriverPool(size=1, headless=False, max_uses=DRIVER_MAX_USES, driver_factory=create_booking_driver)
+atexit.register(SCRAPE_DRIVER_POOL.shutdown)
+atexit.register(BOOKING_DRIVER_POOL.shutdown)
+
+# מעקב אחרי טיסות שנבחרו: מרווח בסיס לטיסות ביממה הקרובה, ג'יטר לפיזור הבדיקות
+MONITOR_INTERVAL = float(os.environ.get('MONITOR_INTERVAL', 60))
+MONITOR_JITTER = float(os.environ.get('MONITOR_JITTER', 0.2))
+MONITOR_IDLE_POLL = 5
+
+# רשימת המעקב ותוצאות החיפוש האחרון לכל סשן, עם תקרה על מספר הסשנים שנשמרים
+LAST_SEARCHES_MAX = 500
+SHARED_STORE = None
+if STATE_BACKEND == 'sqlite':
+    SHARED_STORE = SharedStore(STATE_DB_FILE)
+    SELECTED_FLIGHTS = SharedWatchlist(SHARED_STORE)
+    LAST_SEARCHES = SharedLastSearches(SHARED_STORE, max_entries=LAST_SEARCHES_MAX)
+    if not os.environ.get('FLASK_SECRET_KEY'):
+        # כל העובדים צריכים לפענח את אותה עוגיית סשן
+        app.secret_key = SHARED_STORE.secret_key()
+else:
+    # נשמרת לדיסק כדי שהמעקב ימשיך מאותו מקום אחרי הפעלה מחדש
+    SELECTED_FLIGHTS = Watchlist(path=WATCHLIST_FILE)
+    atexit.register(SELECTED_FLIGHTS.flush)
+    LAST_SEARCHES = LastSearches(max_entries=LAST_SEARCHES_MAX)
+MONITOR_LEADER = LeaderLock(MONITOR_LOCK_FILE)
+
+# דחיפת עדכוני מעקב לדפדפן (SSE / long-poll)
+WATCHLIST_FEED = SELECTED_FLIGHTS.feed
+SSE_HEARTBEAT_INTERVAL = 15
+LONG_POLL_TIMEOUT = 30
+# כל חיבור SSE מחזיק שרשור של העובד כל עוד הדף פתוח; מעבר לתקרה הדפדפן עובר ל-long-poll,
+# כדי שיישארו שרשורים לבקשות הרגילות (gunicorn.conf.py מגדיר threads לפי התקרה הזו)
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 32))
+SSE_STREAMS = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+# חימום הקאש לימים הקרובים בשעות השקטות, לפי תדירות החיפושים בפועל
+PREWARM_ENABLED = os.environ.get('PREWARM_ENABLED', '1') == '1'
+PREWARM_HORIZON_DAYS = int(os.environ.get('PREWARM_HORIZON_DAYS', 14))
+PREWARM_HOURS = parse_hours(os.environ.get('PREWARM_HOURS', '0-7'))
+PREWARM_MIN_GAP = float(os.environ.get('PREWARM_MIN_GAP', 20))
+# עם כמה עובדים הלוג ב-state.db, כדי שהמוביל יראה את החיפושים של כולם
+QUERY_LOG = SharedQueryLog(SHARED_STORE) if SHARED_STORE else QueryLog(os.environ.get('QUERY_LOG_FILE', 'search_log.jsonl'))
+
+API_DAYS_PER_PAGE = 7
+API_MAX_DAYS_PER_PAGE = 31
+
+# חיפוש מקבילי של טווח תאריכים - ברירת המחדל היא מספר עובדים כגודל מאגר הדרייברים
+SEARCH_WORKERS = int(os.environ.get('SEARCH_WORKERS', DRIVER_POOL_SIZE))
+SEARCH_TASK_TIMEOUT = float(os.environ.get('SEARCH_TASK_TIMEOUT', 45))
+SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix='search')
+
+# לכל עובד קאש משלו על אותו קובץ: כל כתיבה ממזגת עם הרשומות של העובדים האחרים, ואיפוס
+# בעובד אחד מגדיל את המונה המשותף וכל השאר מתרוקנים בגישה הבאה
+CACHE_GENERATION = 'cache_generation'
+FLIGHT_CACHE = FlightCache(CACHE_FILE, CACHE_DURATION, max_entries=CACHE_MAX_ENTRIES,
+                           flush_interval=CACHE_FLUSH_INTERVAL, soft_ttl=CACHE_SOFT_TTL,
+                           generation=(lambda: SHARED_STORE.counter(CACHE_GENERATION)) if SHARED_STORE else None,
+                           shared_file=SHARED_STORE is not None)
+atexit.register(FLIGHT_CACHE.flush)
+
+# צילומי HTML של גרידות שנכשלו: דחוסים, בטבעת חסומה, נכתבים ברקע
+DEBUG_CAPTURES = DebugCaptures(
+    os.environ.get('DEBUG_CAPTURE_DIR', 'debug_captures'),
+    max_entries=int(os.environ.get('DEBUG_CAPTURE_MAX_ENTRIES', 50)),
+    max_bytes=int(os.environ.get('DEBUG_CAPTURE_MAX_MB', 20)) * 1024 * 1024,
+    sample_rate=float(os.environ.get('DEBUG_CAPTURE_SAMPLE', 1.0)),
+    min_interval=float(os.environ.get('DEBUG_CAPTURE_MIN_INTERVAL', 60))
+)
+atexit.register(DEBUG_CAPTURES.close)
+
+# היסטוריית תמונות מצב (מקומות ומחיר) לכל יום-מסלול
+FLIGHT_STORE = FlightStore(FLIGHT_DB_FILE)
+
+# מנוע הגרידה: 'http' מנסה קודם בקשת HTTP בלי דפדפן וחוזר ל-Selenium רק בכישלון
+SCRAPE_ENGINE = os.environ.get('SCRAPE_ENGINE', 'http')
+HTTP_ENGINE = HttpEngine(timeout=float(os.environ.get('HTTP_ENGINE_TIMEOUT', 10)), pool_size=SEARCH_WORKERS)
+atexit.register(HTTP_ENGINE.close)
 
-def scrape_flights(args):
-    date, origin, destination, direction = args
-    cache_key = f"{date}_{origin}_{destination}_{direction}"
+def placeholder_flights(date, origin, destination, direction, departure_time, current_time):
+    return [{
+        'direction': direction,
+        'date': date,
+        'departure_time': departure_time,
+        'arrival_time': 'N/A',
+        'price': 'N/A',
+        'seats_left': 'N/A',
+        'duration': 'N/A',
+        'flight_code': 'N/A',
+        'airline': 'N/A',
+        'origin': origin,
+        'destination': destination,
+        'index': 0,
+        'booking_url': None,
+        'last_checked': current_time,
+        'changed': False,
+        'is_full': False
+    }]
+
+def scrape_timeout_flights(task):
+    return placeholder_flights(task.date, task.origin, task.destination, task.direction, 'הבדיקה לא הסתיימה בזמן', datetime.now().strftime('%H:%M:%S'))
+
+def is_placeholder(flight_data):
+    return not flight_data or all(flight['flight_code'] == 'N/A' for flight in flight_data)
+
+def is_placeholder_records(records):
+    return not records or all(record.flight_code == 'N/A' for record in records)
+
+def results_url(task):
+    return f"{ISRAIR_BASE_URL}/reservation/search/domestic-flights/he/results?{results_query(task)}"
+
+def scrape_flights(task, force_refresh=False):
+    cache_key = task_key(task)
     current_time = datetime.now().strftime('%H:%M:%S')
     
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-            if not isinstance(cache, dict):
-                logger.warning("קובץ הקאש פגום, מאתחל מחדש")
-                cache = {}
-            if cache_key in cache:
-                if 'timestamp' in cache[cache_key] and 'data' in cache[cache_key]:
-                    if (datetime.now() - datetime.strptime(cache[cache_key]['timestamp'], '%Y-%m-%d %H:%M:%S')) < CACHE_DURATION:
-                        logger.debug(f"שימוש בנתונים מהקאש עבור {cache_key}")
-                        flight_data = cache[cache_key]['data']
-                        for flight in flight_data:
-                            flight['last_checked'] = current_time
-                        return flight_data
-                else:
-                    logger.warning(f"מבנה לא תקין בקאש עבור {cache_key}, נתעלם ממנו")
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"שגיאה בקריאת קובץ הקאש: {str(e)}, מאתחל מחדש")
-            cache = {}
+    flight_data, stale = None, False
+    if not force_refresh:
+        with timed('cache_read'):
+            flight_data, stale = FLIGHT_CACHE.lookup(cache_key)
+        CACHE_REQUESTS.inc(result='miss' if flight_data is None else 'stale' if stale else 'hit')
+    if flight_data is not None:
+        logger.debug(f"שימוש בנתונים מהקאש עבור {cache_key}")
+        if stale:
+            # מגישים את הנתונים הישנים מיד ומרעננים ברקע
+            REFRESH_WORKERS.submit(cache_key, task)
+        for flight in flight_data:
+            flight['last_checked'] = current_time
+        return flight_data
     
-    url = f"https://www.israir.co.il/reservation/search/domestic-flights/he/results?origin={origin}&destination={destination}&startDate={date}&eilatResident=1"
-    driver = setup_driver(headless=True)
+    # גרידה אחת לכל cache_key גם כשכמה חיפושים (או המעקב) מבקשים אותו במקביל
+    flight_data, shared = SCRAPE_SINGLE_FLIGHT.do(cache_key, lambda: fetch_route_day(task, current_time))
+    if shared:
+        SCRAPES_COALESCED.inc()
+        logger.debug(f"גרידה של {cache_key} שותפה עם קריאה מקבילה")
+    return [dict(flight) for flight in flight_data]
+
+def fetch_route_day(task, current_time):
+    date, origin, destination, direction, _ = task
+    cache_key = task_key(task)
+    url = results_url(task)
+    flight_data = None
+    if SCRAPE_ENGINE == 'http' and HTTP_ENGINE.available():
+        flight_data = scrape_with_http(url, date, origin, destination, direction, current_time)
+    if flight_data is None:
+        flight_data = scrape_with_selenium(url, date, origin, destination, direction, current_time, cache_key)
+    if flight_data is None:
+        return placeholder_flights(date, origin, destination, direction, 'N/A', current_time)
+
+    # השוואה לגרידה הקודמת של אותו יום-מסלול על רשומות ה-Flight, בלי לפענח שוב את הטקסט;
+    # דף ריק לא נחשב כהסרה של כל הטיסות, וגרידה קודמת ריקה לא נחשבת כבסיס (אחרת כל טיסה "נוספה")
+    records = [Flight.from_dict(flight) for flight in flight_data]
+    previous = FLIGHT_CACHE.flights(cache_key)
+    if previous is None or is_placeholder_records(previous) or is_placeholder(flight_data):
+        changes = []
+    else:
+        changes = diff_snapshots(previous, records)
+
+    with timed('cache_write'):
+        FLIGHT_CACHE.set_flights(cache_key, records)
+    try:
+        FLIGHT_STORE.record_snapshot(date, origin, destination, direction, flight_data, changes=changes,
+                                     passengers=task.passengers)
+    except Exception as e:
+        logger.error(f"שגיאה בשמירת תמונת מצב ל-SQLite: {str(e)}")
+    if not is_placeholder(flight_data):
+        apply_flight_changes(task, flight_data, changes)
+    
+    if logger.isEnabledFor(logging.DEBUG) and sampled(PAYLOAD_LOG_SAMPLE):
+        logger.debug(f"Returning flight_data: {flight_data}")
+    return flight_data
+
+SCRAPE_SINGLE_FLIGHT = SingleFlight()
+REFRESH_WORKERS = RefreshWorkers(lambda task: scrape_flights(task, force_refresh=True), workers=CACHE_REFRESH_WORKERS)
+
+def cache_age(task):
+    cached_at = FLIGHT_CACHE.timestamp(task_key(task))
+    return datetime.now() - cached_at if cached_at else None
+
+PREWARMER = Prewarmer(
+    refresh=lambda task: scrape_flights(task, force_refresh=True),
+    tasks_for_date=lambda date: build_search_tasks([date], ROUTES),
+    cache_age=cache_age,
+    query_log=QUERY_LOG,
+    horizon_days=PREWARM_HORIZON_DAYS,
+    active_hours=PREWARM_HOURS,
+    min_gap=PREWARM_MIN_GAP,
+    base_interval=CACHE_SOFT_TTL,
+    max_interval=CACHE_DURATION / 4
+)
+
+def scrape_with_http(url, date, origin, destination, direction, current_time):
+    start = time.monotonic()
+    try:
+        logger.debug(f"מנסה לגשת לכתובת עם HTTP: {url}")
+        with timed('http_fetch'):
+            flight_data = HTTP_ENGINE.fetch(url, lambda html: parse_flight_cards(html, date, origin, destination, direction, current_time))
+    except FastPathFailed as e:
+        logger.debug(f"המנוע המהיר נכשל, עובר ל-Selenium: {str(e)}")
+        record_scrape('http', time.monotonic() - start, ok=False)
+        return None
+    record_scrape('http', time.monotonic() - start, ok=True, cards=len(flight_data))
+    logger.debug(f"נמצאו {len(flight_data)} טיסות ב-HTML עם HTTP")
+    return flight_data
+
+def scrape_with_selenium(url, date, origin, destination, direction, current_time, cache_key):
+    start = time.monotonic()
+    driver = SCRAPE_DRIVER_POOL.acquire(timeout=DRIVER_ACQUIRE_TIMEOUT)
+    driver_broken = False
     try:
         logger.debug(f"מנסה לגשת לכתובת עם Selenium: {url}")
-        driver.get(url)
+        with timed('page_load'):
+            driver.get(url)
         
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "flight-result-item-card--domestic"))
-        )
-        time.sleep(3)
+        with timed('wait'):
+            wait_until(driver, results_ready(), timeout=15)
         
-        flight_cards = driver.find_elements(By.CSS_SELECTOR, ".flight-result-item-card--domestic")
+        # קריאה אחת של ה-HTML במקום find_element נפרד לכל שדה בכל כרטיס
+        with timed('extract'):
+            page_source = driver.page_source
+            flight_cards = find_cards(page_source)
         logger.debug(f"נמצאו {len(flight_cards)} טיסות ב-HTML עם Selenium")
         
         if not flight_cards:
             logger.warning("לא נמצאו טיסות בדף")
-            with open('debug_html.html', 'w', encoding='utf-8') as f:
-                f.write(driver.page_source)
-            flight_data = [{
-                'direction': direction,
-                'date': date,
-                'departure_time': 'אין טיסות',
-                'arrival_time': 'N/A',
-                'price': 'N/A',
-                'seats_left': 'N/A',
-                'duration': 'N/A',
-                'flight_code': 'N/A',
-                'airline': 'N/A',
-                'origin': origin,
-                'destination': destination,
-                'index': 0,
-                'booking_url': None,
-                'last_checked': current_time,
-                'changed': False,
-                'is_full': False
-            }]
+            DEBUG_CAPTURES.capture(cache_key, 'empty', page_source)
+            flight_data = placeholder_flights(date, origin, destination, direction, 'אין טיסות', current_time)
         else:
-            flight_data = []
-            for index, card in enumerate(flight_cards):
-                try:
-                    logger.debug(f"מחלץ נתונים עבור טיסה {index}")
-                    
-                    time_blocks = card.find_elements(By.CSS_SELECTOR, ".flight-text-block--primary .flight-text-block__bottom-text--primary")
-                    departure_time = time_blocks[0].text.strip() if len(time_blocks) > 0 else "לא נמצא זמן"
-                    arrival_time = time_blocks[1].text.strip() if len(time_blocks) > 1 else "לא נמצא זמן הגעה"
-                    logger.debug(f"טיסה {index}: departure_time={departure_time}, arrival_time={arrival_time}")
-                    
-                    price_elem = card.find_element(By.CSS_SELECTOR, ".flight-result-price__top--domestic span:last-child")
-                    price = price_elem.text.strip() if price_elem else "לא נמצא מחיר"
-                    logger.debug(f"טיסה {index}: price={price}")
-                    
-                    seats_elem = card.find_element(By.CSS_SELECTOR, ".purchase-block-button-group__top")
-                    seats_left = seats_elem.text.strip() if seats_elem else "לא נמצא מידע על מקומות"
-                    is_full = seats_left in ["אין מקומות", "0", "מלאה", "לא נמצא מידע על מקומות"]
-                    if is_full:
-                        seats_left = "טיסה מלאה"
-                    logger.debug(f"טיסה {index}: seats_left={seats_left}, is_full={is_full}")
-                    
-                    duration_elem = card.find_element(By.CSS_SELECTOR, ".flight-text-block--sm .flight-text-block__top-text--primary")
-                    duration = duration_elem.text.strip() if duration_elem else "לא נמצא משך"
-                    logger.debug(f"טיסה {index}: duration={duration}")
-                    
-                    flight_code_elem = card.find_element(By.CSS_SELECTOR, ".flight-text-block__top-text--powered-by")
-                    flight_code_text = flight_code_elem.text.strip()
-                    flight_code = flight_code_text.split('[')[-1].split(']')[0] if '[' in flight_code_text else "לא נמצא קוד טיסה"
-                    logger.debug(f"טיסה {index}: flight_code={flight_code}")
-                    
-                    airline_elem = card.find_element(By.CSS_SELECTOR, ".flight-text-block__bottom-text--powered-by .dib")
-                    airline = airline_elem.text.strip() if airline_elem else "לא נמצאה חברה"
-                    logger.debug(f"טיסה {index}: airline={airline}")
-                    
-                    booking_url = None
-                    try:
-                        select_button = card.find_element(By.CSS_SELECTOR, ".purchase-block-button-group__button")
-                        button_html = driver.execute_script("return arguments[0].outerHTML;", select_button)
-                        if 'data-deal-id' in button_html:
-                            deal_id = select_button.get_attribute('data-deal-id')
-                            booking_url = f"https://www.israir.co.il/reservation/deal/searchDomesticFlight/he/{deal_id}"
-                        elif 'onclick' in button_html:
-                            onclick = select_button.get_attribute('onclick')
-                            if onclick and 'window.open' in onclick:
-                                start = onclick.find("'") + 1
-                                end = onclick.find("'", start)
-                                booking_url = onclick[start:end]
-                    except NoSuchElementException:
-                        logger.debug(f"טיסה {index}: לא נמצא כפתור בחירה")
-                    
-                    flight_data.append({
-                        'direction': direction,
-                        'date': date,
-                        'departure_time': departure_time,
-                        'arrival_time': arrival_time,
-                        'price': price,
-                        'seats_left': seats_left,
-                        'duration': duration,
-                        'flight_code': flight_code,
-                        'airline': airline,
-                        'origin': origin,
-                        'destination': destination,
-                        'index': index,
-                        'booking_url': booking_url,
-                        'last_checked': current_time,
-                        'changed': False,
-                        'is_full': is_full
-                    })
-                    logger.debug(f"טיסה {index} נוספה ל-flight_data: {flight_data[-1]}")
-                except Exception as e:
-                    logger.error(f"שגיאה בחילוץ פרטי טיסה {index}: {str(e)}")
-                    continue
-        
-        cache = {}
-        if os.path.exists(CACHE_FILE):
-            try:
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    cache = json.load(f)
-                if not isinstance(cache, dict):
-                    cache = {}
-            except json.JSONDecodeError:
-                cache = {}
-            shutil.copy(CACHE_FILE, CACHE_FILE + '.bak')
-        cache[cache_key] = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'data': flight_data
-        }
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, ensure_ascii=False)
+            with timed('parse'):
+                flight_data = parse_cards(flight_cards, date, origin, destination, direction, current_time)
         
-        logger.debug(f"Returning flight_data: {flight_data}")
+        record_scrape('selenium', time.monotonic() - start, ok=True, cards=len(flight_cards))
         return flight_data
     
     except Exception as e:
         logger.error(f"שגיאה בגרידה עם Selenium: {str(e)}")
-        with open('debug_html_error.html', 'w', encoding='utf-8') as f:
-            f.write(driver.page_source)
-        flight_data = [{
-            'direction': direction,
-            'date': date,
-            'departure_time': 'N/A',
-            'arrival_time': 'N/A',
-            'price': 'N/A',
-            'seats_left': 'N/A',
-            'duration': 'N/A',
-            'flight_code': 'N/A',
-            'airline': 'N/A',
-            'origin': origin,
-            'destination': destination,
-            'index': 0,
-            'booking_url': None,
-            'last_checked': current_time,
-            'changed': False,
-            'is_full': False
-        }]
-        return flight_data
+        try:
+            DEBUG_CAPTURES.capture(cache_key, 'error', driver.page_source)
+        except Exception:
+            # הסשן קרס - לא נחזיר אותו למאגר
+            driver_broken = True
+        record_scrape('selenium', time.monotonic() - start, ok=False)
+        return None
     finally:
-        driver.quit()
+        SCRAPE_DRIVER_POOL.release(driver, discard=driver_broken)
+
+# שדות שהדף מציג - שינוי באחד מהם נדחף לדפדפנים הפתוחים (כולל זמן הבדיקה האחרונה)
+PUSHED_FIELDS = ('seats_left', 'price', 'is_full', 'changed', 'last_checked')
+
+def apply_flight_changes(task, flight_data, changes):
+    """מעדכן את הטיסות במעקב מגרידה חדשה של יום-מסלול ומעביר את השינויים שלהן להתראות ולדף"""
+    changes_by_key = {}
+    for change in changes:
+        changes_by_key.setdefault(selected_flight_key({'flight_code': change.flight_code}, task), []).append(change)
+    current_time = datetime.now().strftime('%H:%M:%S')
+    selected = SELECTED_FLIGHTS.snapshot()
+    events = []
+    updated_keys = []
+    saved = {}
+    for flight in flight_data:
+        key = selected_flight_key(flight, task)
+        if key not in selected:
+            continue
+        # עותק, כדי שמי שקורא את הרשימה (או כותב אותה לדיסק) לא יראה טיסה מעודכנת למחצה
+        watched = dict(selected[key])
+        before = [watched.get(field) for field in PUSHED_FIELDS]
+        watched['seats_left'] = flight['seats_left']
+        watched['price'] = flight['price']
+        watched['is_full'] = flight['is_full']
+        # המיקום בדף יכול להשתנות; הקוד הוא שמזהה את הטיסה
+        watched['index'] = flight['index']
+        watched['last_checked'] = current_time
+        watched['changed'] = key in changes_by_key
+        saved[key] = watched
+        if [watched.get(field) for field in PUSHED_FIELDS] != before:
+            updated_keys.append(key)
+    for key, flight_changes in changes_by_key.items():
+        if key not in selected:
+            continue
+        watched = saved.get(key) or dict(selected[key])
+        if flight_changes[0].kind == REMOVED:
+            watched['changed'] = True
+            watched['last_checked'] = current_time
+            saved[key] = watched
+            updated_keys.append(key)
+        for change in flight_changes:
+            logger.debug(f"שינוי בטיסה שנבחרה {key}: {change.kind} {change.old} -> {change.new}")
+            events.append(SeatChangeEvent(key, describe(change)))
+    if saved:
+        SELECTED_FLIGHTS.save(saved, updated_keys)
+    # עובד שאינו מוביל לא שולח התראות: המוביל יזהה את אותו שינוי בבדיקה הבאה שלו
+    if MONITOR_LEADER.held:
+        MONITOR_SERVICE.publish(events)
+
+def fetch_monitor_group(group):
+    # בדיקה אחת לכל יום-מסלול, ישירות מהאתר ולא מהקאש
+    return scrape_flights(group, force_refresh=True)
+
+def apply_monitor_result(group, flight_keys, result):
+    # העדכון וההתראות כבר נעשו ב-fetch_route_day מתוך ה-diff של הגרידה
+    if is_placeholder(result):
+        logger.warning(f"הבדיקה של {group} נכשלה, ננסה שוב בסבב הבא")
+    return []
+
+def monitor_interval_for_group(group, flight_keys):
+    selected = SELECTED_FLIGHTS.snapshot()
+    watched = [selected.get(key) for key in flight_keys]
+    departures = [departure_datetime(group[0], flight.get('departure_time')) for flight in watched if flight]
+    departure = min((d for d in departures if d), default=None)
+    return interval_for(departure, MONITOR_INTERVAL)
+
+def make_sms_sender():
+    if not ENABLE_SMS:
+        return None
+    if SMS_BACKEND == 'stub':
+        return StubSmsSender()
+    return twilio_sender()
+
+SMS_SENDER = make_sms_sender()
+
+MONITOR_SERVICE = MonitorService(
+    scheduler=MonitorScheduler(base_interval=MONITOR_INTERVAL, jitter=MONITOR_JITTER),
+    get_groups=lambda: group_selected_flights(SELECTED_FLIGHTS.snapshot()),
+    fetch_group=fetch_monitor_group,
+    apply_result=apply_monitor_result,
+    interval_for_group=monitor_interval_for_group,
+    sender=SMS_SENDER,
+    executor=SEARCH_EXECUTOR,
+    max_concurrency=SEARCH_WORKERS,
+    idle_poll=MONITOR_IDLE_POLL
+)
 
 def monitor_selected_flights():
-    while True:
-        current_time = datetime.now().strftime('%H:%M:%S')
-        if SELECTED_FLIGHTS:
-            logger.debug(f"בודק טיסות שנבחרו: {SELECTED_FLIGHTS}")
-            for flight_key, flight in list(SELECTED_FLIGHTS.items()):
-                date, origin, destination, direction, index = flight_key.split('_')
-                result = scrape_flights((date, origin, destination, direction))
-                if result and len(result) > int(index):
-                    current_flight = result[int(index)]
-                    prev_seats = flight.get('seats_left', 'לא ידוע')
-                    curr_seats = current_flight['seats_left']
-                    
-                    if prev_seats != curr_seats:
-                        logger.debug(f"שינוי זוהה בטיסה שנבחרה {flight_key}: {prev_seats} -> {curr_seats}")
-                        flight['changed'] = True
-                        message = f"שינוי במספר המקומות בטיסה {flight['flight_code']} ב-{date} מ-{origin} ל-{destination} בשעה {flight['departure_time']}: {prev_seats} -> {curr_seats}"
-                        if ENABLE_SMS:
-                            send_sms(message)
-                    else:
-                        flight['changed'] = False
-                    
-                    flight['seats_left'] = curr_seats
-                    flight['last_checked'] = current_time
-                    flight['is_full'] = current_flight['is_full']
-                    flight['price'] = current_flight['price']
-        time.sleep(60)
-
-def send_sms(message):
+    MONITOR_SERVICE.run_forever()
+
+def run_monitor_leader():
+    """רץ בכל תהליך; רק זה שמחזיק בנעילה מחמם את הקאש ומריץ את המעקב"""
+    def lead():
+        if FLIGHT_STORE.is_empty():
+            FLIGHT_STORE.import_json_cache(CACHE_FILE)
+        if PREWARM_ENABLED:
+            PREWARMER.start()
+        if BOOKING_PREWARM:
+            warm_booking_driver()
+        monitor_selected_flights()
+    run_as_leader(MONITOR_LEADER, lead, retry_interval=MONITOR_LEADER_RETRY)
+
+def warm_drivers():
+    # איתור ה-ChromeDriver (אולי דרך הרשת) ועליית Chrome ברקע, כדי לא לעכב את עליית השרת
     try:
-        client.messages.create(
-            body=message,
-            from_=TWILIO_PHONE_NUMBER,
-            to=USER_PHONE_NUMBER
-        )
-        logger.debug(f"SMS נשלח: {message}")
+        resolve_driver_path()
+        SCRAPE_DRIVER_POOL.warm(1)
     except Exception as e:
-        logger.error(f"שגיאה בשליחת SMS: {str(e)}")
+        logger.error(f"חימום הדרייברים נכשל, הגרידה הראשונה תפתח דפדפן: {str(e)}")
+
+def warm_booking_driver():
+    def warm():
+        try:
+            BOOKING_DRIVER_POOL.warm(1)
+        except Exception as e:
+            logger.error(f"חימום דפדפן ההזמנה נכשל, ההזמנה הבאה תפתח דפדפן: {str(e)}")
+    threading.Thread(target=warm, name='booking-warmup', daemon=True).start()
+
+def start_background_services():
+    """מה שכל תהליך שמגיש בקשות מפעיל בעלייה (app.run או עובד gunicorn)"""
+    threading.Thread(target=warm_drivers, name='driver-warmup', daemon=True).start()
+    threading.Thread(target=run_monitor_leader, name='monitor-leader', daemon=True).start()
+
+def date_range(start, end):
+    dates = []
+    current = start
+    while current <= end:
+        dates.append(current.strftime("%d/%m/%Y"))
+        current += timedelta(days=1)
+    return dates
+
+def get_last_search():
+    search_id = session.get('search_id')
+    return LAST_SEARCHES.get(search_id) if search_id else None
+
+def save_last_search(flights, search_id=None):
+    """התוצאות האחרונות נשמרות לכל סשן בנפרד ולא במשתנה גלובלי אחד לכל המשתמשים"""
+    if search_id is None:
+        search_id = session.setdefault('search_id', uuid.uuid4().hex)
+    LAST_SEARCHES.put(search_id, flights)
+
+def search_form_state(form):
+    """מסלולים ונוסעים מהטופס (או מפרמטרי ה-API); ValueError על ערכים לא תקינים"""
+    route = form.get('route', 'all')
+    if route == 'all':
+        routes = ROUTES
+    else:
+        routes = parse_routes(route)
+        if not set(routes) <= set(ROUTES):
+            raise ValueError("מסלול לא נתמך")
+    passengers = make_passengers(
+        form.get('adults', 1) or 1,
+        form.get('children', 0) or 0,
+        form.get('infants', 0) or 0,
+        form.get('eilat_resident', '1') in ('1', 'on', 'true')
+    )
+    if passengers[:3] != DEFAULT_PASSENGERS[:3] and not PASSENGER_COUNTS_ENABLED:
+        raise ValueError("חיפוש עם יותר מנוסע אחד עדיין לא נתמך")
+    return route, routes, passengers
+
+def search_form_tasks(form):
+    """משימות החיפוש מטופס החיפוש; ValueError עם הודעה למשתמש על קלט לא תקין"""
+    try:
+        start = datetime.strptime(form['start_date'], '%d/%m/%Y')
+        end = datetime.strptime(form['end_date'], '%d/%m/%Y')
+    except ValueError:
+        raise ValueError("פורמט תאריך לא תקין. השתמש ב-dd/mm/yyyy") from None
+    if start > end:
+        raise ValueError("תאריך התחלה חייב להיות לפני תאריך סיום")
+    _, routes, passengers = search_form_state(form)
+    dates = date_range(start, end)
+    QUERY_LOG.record(dates)
+    # כל התאריכים x המסלולים x הכיוונים רצים יחד על אותו מאגר שרשורים ואותו קאש
+    return build_search_tasks(dates, routes, passengers=passengers)
+
+def result_rows(task, result, selected):
+    """טיסות של יום-מסלול לתצוגה: מפתח מעקב, והמצב העדכני של טיסות שבמעקב"""
+    for flight in result:
+        flight['key'] = selected_flight_key(flight, task)
+        if flight['key'] in selected:
+            selected_flight = selected[flight['key']]
+            flight['seats_left'] = selected_flight['seats_left']
+            flight['last_checked'] = selected_flight['last_checked']
+            flight['changed'] = selected_flight['changed']
+            flight['is_full'] = selected_flight['is_full']
+            flight['price'] = selected_flight['price']
+        if 'last_checked' not in flight or flight['last_checked'] is None:
+            flight['last_checked'] = datetime.now().strftime('%H:%M:%S')
+    return result
+
+def render_home(flights, watch_version, error=None, search=None):
+    return render_template('flights.html', flights=flights, error=error, last_run=LAST_RUN_TIME,
+                           monitored_flights=SELECTED_FLIGHTS.snapshot(), watch_version=watch_version,
+                           routes=ROUTES, passenger_counts=PASSENGER_COUNTS_ENABLED, search=search or {})
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
-    global LAST_SEARCH_FLIGHTS
-    LAST_SEARCH_FLIGHTS = getattr(app, 'last_search_flights', None)
+    last_search_flights = get_last_search()
+    # הדף מתחיל להאזין לעדכונים מהגרסה שלפני הרינדור, כדי לא לפספס שינוי באמצע
+    watch_version = WATCHLIST_FEED.version
     
     if request.method == 'POST':
-        start_date = request.form['start_date']
-        end_date = request.form['end_date']
-        
+        search = request.form.to_dict()
         try:
-            start = datetime.strptime(start_date, '%d/%m/%Y')
-            end = datetime.strptime(end_date, '%d/%m/%Y')
-            
-            if start > end:
-                return render_template('flights.html', error="תאריך התחלה חייב להיות לפני תאריך סיום", flights=None, last_run=LAST_RUN_TIME, monitored_flights={})
-            
-            tasks = []
-            current = start
-            while current <= end:
-                date_str = current.strftime("%d/%m/%Y")
-                tasks.append((date_str, "ETM", "TLV", "הלוך"))
-                tasks.append((date_str, "TLV", "ETM", "חזור"))
-                current += timedelta(days=1)
-            
-            all_flights = []
-            for task in tasks:
-                result = scrape_flights(task)
-                for flight in result:
-                    flight['key'] = f"{flight['date']}_{flight['origin']}_{flight['destination']}_{flight['direction']}_{flight['index']}"
-                    if flight['key'] in SELECTED_FLIGHTS:
-                        selected_flight = SELECTED_FLIGHTS[flight['key']]
-                        flight['seats_left'] = selected_flight['seats_left']
-                        flight['last_checked'] = selected_flight['last_checked']
-                        flight['changed'] = selected_flight['changed']
-                        flight['is_full'] = selected_flight['is_full']
-                        flight['price'] = selected_flight['price']
-                    if 'last_checked' not in flight or flight['last_checked'] is None:
-                        flight['last_checked'] = datetime.now().strftime('%H:%M:%S')
-                    all_flights.append(flight)
-            
-            logger.debug(f"כל הטיסות שנאספו: {all_flights}")
-            LAST_SEARCH_FLIGHTS = all_flights
-            app.last_search_flights = all_flights
-            return render_template('flights.html', flights=all_flights, error=None, last_run=LAST_RUN_TIME, monitored_flights={})
+            tasks = search_form_tasks(request.form)
+        except ValueError as e:
+            return render_home(last_search_flights, watch_version, error=str(e), search=search)
+        
+        results = run_tasks(SEARCH_EXECUTOR, scrape_flights, tasks, task_timeout=SEARCH_TASK_TIMEOUT, on_timeout=scrape_timeout_flights)
+        selected = SELECTED_FLIGHTS.snapshot()
+        all_flights = []
+        for task, result in zip(tasks, results):
+            all_flights.extend(result_rows(task, result, selected))
         
-        except ValueError:
-            return render_template('flights.html', error="פורמט תאריך לא תקין. השתמש ב-dd/mm/yyyy", flights=LAST_SEARCH_FLIGHTS, last_run=LAST_RUN_TIME, monitored_flights={})
+        if logger.isEnabledFor(logging.DEBUG) and sampled(PAYLOAD_LOG_SAMPLE):
+            logger.debug(f"כל הטיסות שנאספו: {all_flights}")
+        save_last_search(all_flights)
+        return render_home(all_flights, watch_version, search=search)
     
-    return render_template('flights.html', flights=LAST_SEARCH_FLIGHTS, error=None, last_run=LAST_RUN_TIME, monitored_flights={})
+    return render_home(last_search_flights, watch_version)
 
-@app.route('/book_flight', methods=['POST'])
-def book_flight():
-    data = request.get_json()
-    date = data.get('date')
-    origin = data.get('origin')
-    destination = data.get('destination')
-    flight_index = int(data.get('index'))
+def ndjson_line(message):
+    return json.dumps(message, ensure_ascii=False) + "\n"
 
-    url = f"https://www.israir.co.il/reservation/search/domestic-flights/he/results?origin={origin}&destination={destination}&startDate={date}&eilatResident=1"
-    driver = setup_driver(headless=False)
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """אותו חיפוש כמו בטופס, כ-NDJSON: שורות ה-HTML של כל יום-מסלול נשלחות ברגע שהגרידה שלו מסתיימת"""
     try:
+        tasks = search_form_tasks(request.form)
+    except ValueError as e:
+        return Response(ndjson_line({'type': 'error', 'message': str(e)}), status=400, mimetype='application/x-ndjson')
+    # הסשן נכתב לעוגייה לפני שהתגובה מתחילה לזרום
+    search_id = session.setdefault('search_id', uuid.uuid4().hex)
+    flight_rows = get_template_attribute('flight_rows.html', 'flight_rows')
+    show_route = len(ROUTES) > 1
+
+    def generate():
+        yield ndjson_line({'type': 'start', 'tasks': len(tasks)})
+        results = [[] for _ in tasks]
+        done = 0
+        for i, result in iter_tasks(SEARCH_EXECUTOR, scrape_flights, tasks, task_timeout=SEARCH_TASK_TIMEOUT, on_timeout=scrape_timeout_flights):
+            selected = SELECTED_FLIGHTS.snapshot()
+            results[i] = result_rows(tasks[i], result, selected)
+            done += 1
+            task = tasks[i]
+            yield ndjson_line({
+                'type': 'day',
+                'index': i,
+                'done': done,
+                'date': task.date,
+                'origin': task.origin,
+                'destination': task.destination,
+                'direction': task.direction,
+                'html': str(flight_rows(results[i], selected, show_route))
+            })
+        save_last_search([flight for result in results for flight in result], search_id)
+        yield ndjson_line({'type': 'done', 'tasks': len(tasks)})
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+API_DIRECTIONS = {'outbound': ("הלוך",), 'return': ("חזור",), 'both': ("הלוך", "חזור")}
+
+@app.route('/api/flights', methods=['GET'])
+def api_flights():
+    """חיפוש בטווח תאריכים שמחזיר JSON, מחולק לעמודים לפי ימים, עם ETag/Last-Modified מזמני הקאש"""
+    try:
+        start = datetime.strptime(request.args['start_date'], '%d/%m/%Y')
+        end = datetime.strptime(request.args.get('end_date', request.args['start_date']), '%d/%m/%Y')
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'חסר start_date'}), 400
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'פורמט תאריך לא תקין. השתמש ב-dd/mm/yyyy'}), 400
+    if start > end:
+        return jsonify({'status': 'error', 'message': 'תאריך התחלה חייב להיות לפני תאריך סיום'}), 400
+
+    origin = request.args.get('origin')
+    destination = request.args.get('destination')
+    try:
+        _, routes, passengers = search_form_state(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    directions = API_DIRECTIONS.get(request.args.get('direction', 'both'))
+    if directions is None:
+        return jsonify({'status': 'error', 'message': 'direction חייב להיות outbound, return או both'}), 400
+    if origin and destination:
+        # אותה רשימת מסלולים מותרים כמו בטופס; הערכים נכנסים לכתובת ולמפתח הקאש
+        route = (origin.upper(), destination.upper())
+        if route[::-1] in ROUTES and route not in ROUTES:
+            # מסלול הפוך: אותו מסלול מ-ROUTES עם הכיוונים מוחלפים, כדי שמפתחות הקאש יהיו כמו בטופס
+            route = route[::-1]
+            directions = tuple("חזור" if direction == "הלוך" else "הלוך" for direction in directions)
+        if route not in ROUTES:
+            return jsonify({'status': 'error', 'message': 'מסלול לא נתמך'}), 400
+        routes = [route]
+    per_page = max(1, min(request.args.get('per_page', API_DAYS_PER_PAGE, type=int), API_MAX_DAYS_PER_PAGE))
+    page = max(1, request.args.get('page', 1, type=int))
+
+    dates = date_range(start, end)
+    pages = (len(dates) + per_page - 1) // per_page
+    page_dates = dates[(page - 1) * per_page:page * per_page]
+    QUERY_LOG.record(page_dates)
+    tasks = build_search_tasks(page_dates, routes, directions, passengers)
+    results = run_tasks(SEARCH_EXECUTOR, scrape_flights, tasks, task_timeout=SEARCH_TASK_TIMEOUT, on_timeout=scrape_timeout_flights)
+
+    days = []
+    timestamps = []
+    for task, result in zip(tasks, results):
+        cached_at = FLIGHT_CACHE.timestamp(task_key(task))
+        timestamps.append(cached_at)
+        days.append({
+            'date': task.date,
+            'origin': task.origin,
+            'destination': task.destination,
+            'direction': task.direction,
+            'passengers': task.passengers._asdict(),
+            'cached_at': cached_at.strftime('%Y-%m-%d %H:%M:%S') if cached_at else None,
+            'flights': result
+        })
+
+    response = jsonify({
+        'page': page,
+        'per_page': per_page,
+        'pages': pages,
+        'total_days': len(dates),
+        'next_page': page + 1 if page < pages else None,
+        'days': days
+    })
+    # תוצאות שלא נשמרו בקאש (למשל גרידה שנכשלה) לא מקבלות ETag כדי שלא ייענו ב-304
+    if timestamps and all(timestamps):
+        fingerprint = "|".join(f"{task_key(task)}@{ts.isoformat()}" for task, ts in zip(tasks, timestamps))
+        response.set_etag(hashlib.sha1(fingerprint.encode('utf-8')).hexdigest())
+        response.last_modified = max(timestamps).astimezone()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return response
+
+DEAL_PAGE_TITLE = "פירוט טיסה"
+DEFAULT_SITE_URL = "https://www.israir.co.il"
+# מפתח טיסה מהדפדפן שלא מתפענח (split_flight_key / parse_task_key זורקים ValueError)
+INVALID_FLIGHT_KEY = 'מפתח טיסה לא תקין'
+
+def cached_booking_url(task, flight_code):
+    """קישור ה-deal של הטיסה מהגרידה האחרונה בקאש, לפי קוד הטיסה (בלי קוד - רק בנתיב המלא)"""
+    flights = FLIGHT_CACHE.flights(task_key(task)) if flight_code not in MISSING_CODES else None
+    booking_url = next((flight.booking_url for flight in flights or () if flight.flight_code == flight_code), None)
+    if not booking_url or not booking_url.startswith(DEAL_URL.split('{')[0]):
+        return None
+    # הקישור נשמר עם כתובת האתר האמיתי; ISRAIR_BASE_URL יכול להפנות לשרת אחר
+    return ISRAIR_BASE_URL + booking_url[len(DEFAULT_SITE_URL):]
+
+def open_deal_page(driver, booking_url, timings):
+    """נתיב מהיר: ישר לדף ה-deal; מחזיר False אם האתר לא הציג אותו (למשל deal שפג)"""
+    from selenium.common.exceptions import TimeoutException
+
+    with timed_into('book_deal_page', timings):
+        driver.get(booking_url)
+        try:
+            wait_until(driver, network_idle(), timeout=10)
+        except TimeoutException:
+            logger.warning("דף ה-deal לא סיים להיטען בזמן, ממשיך")
+    return '/reservation/deal/' in driver.current_url and DEAL_PAGE_TITLE in driver.title
+
+def book_by_click(driver, task, flight_code, flight_index, timings):
+    """הנתיב המלא: דף התוצאות, איתור הכרטיס לפי קוד הטיסה, בחירה והמשך; False אם הטיסה לא נמצאה"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
+    url = results_url(task)
+    with timed_into('book_results_page', timings):
         logger.debug(f"מנסה לגשת לכתובת עם Selenium: {url}")
         driver.get(url)
+        wait_until(driver, EC.presence_of_element_located((By.CLASS_NAME, "flight-result-item-card--domestic")), timeout=10)
 
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "flight-result-item-card--domestic"))
-        )
-
+    with timed_into('book_find_card', timings):
+        # הכרטיס נמצא לפי קוד הטיסה, כי הסדר בדף יכול להשתנות מאז החיפוש
+        snapshot = SnapshotIndex(parse_flight_cards(driver.page_source, task.date, task.origin, task.destination, task.direction, None))
+        target = snapshot.find(f"#{flight_index}", {'flight_code': flight_code})
         flight_cards = driver.find_elements(By.CSS_SELECTOR, ".flight-result-item-card--domestic")
-        if flight_index >= len(flight_cards):
-            return jsonify({'status': 'error', 'message': 'טיסה לא נמצאה'})
+    if target is None or target['index'] >= len(flight_cards):
+        return False
 
-        select_button = flight_cards[flight_index].find_element(By.CSS_SELECTOR, ".purchase-block-button-group__button")
+    with timed_into('book_select', timings):
+        select_button = flight_cards[target['index']].find_element(By.CSS_SELECTOR, ".purchase-block-button-group__button")
         button_text = select_button.text.strip()
         if "בחירה" in button_text:
             select_button.click()
-            logger.debug(f"לחצתי על כפתור 'בחירה' עבור טיסה {flight_index}.")
+            logger.debug(f"לחצתי על כפתור 'בחירה' עבור טיסה {target['flight_code']} (כרטיס {target['index']}).")
         
-        time.sleep(2)
-
-        continue_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'reservation-domestic-flights-booking--btn')]"))
+        continue_button = wait_until(
+            driver,
+            EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'reservation-domestic-flights-booking--btn')]")),
+            timeout=10
         )
+
+    with timed_into('book_continue', timings):
+        current_url = driver.current_url
         continue_button.click()
         logger.debug("לחצתי על 'המשיכו לפרטים והזמנה'.")
+        try:
+            wait_until(driver, EC.url_changes(current_url), timeout=10)
+            wait_until(driver, network_idle(), timeout=10)
+        except TimeoutException:
+            # הדפדפן נשאר פתוח למשתמש, כך שאין סיבה להיכשל אם הדף עדיין נטען
+            logger.warning("דף ההזמנה לא סיים להיטען בזמן, ממשיך")
+    return True
+
+def hand_over_booking_driver(driver):
+    # הדפדפן נשאר פתוח למשתמש ולכן יוצא מהמאגר; דפדפן חלופי נפתח ברקע להזמנה הבאה
+    BOOKING_DRIVER_POOL.detach(driver)
+    if BOOKING_PREWARM and MONITOR_LEADER.held:
+        warm_booking_driver()
+
+@app.route('/book_flight', methods=['POST'])
+def book_flight():
+    data = request.get_json()
+    date = data.get('date')
+    origin = data.get('origin')
+    destination = data.get('destination')
+    direction = data.get('direction', 'הלוך')
+    flight_code = data.get('flight_code')
+    # המפתח כולל את הנוסעים שאיתם חיפשו; בלעדיו - ברירת המחדל
+    try:
+        flight_index = int(data.get('index', 0))
+        task = split_flight_key(data['key'])[0] if data.get('key') else SearchTask(date, origin, destination, direction)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': INVALID_FLIGHT_KEY}), 400
 
-        time.sleep(3)
-        return jsonify({'status': 'success', 'message': 'הגעתי לדף ההזמנה. הדפדפן נשאר פתוח.'})
+    timings = {}
+    try:
+        with timed_into('book_acquire', timings):
+            driver = BOOKING_DRIVER_POOL.acquire(timeout=DRIVER_ACQUIRE_TIMEOUT)
+    except DriverPoolTimeout as e:
+        logger.error(f"אין דפדפן פנוי להזמנה: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'הדפדפן תפוס, נסו שוב בעוד רגע'})
+
+    booking_url = cached_booking_url(task, flight_code)
+    if booking_url:
+        try:
+            if open_deal_page(driver, booking_url, timings):
+                hand_over_booking_driver(driver)
+                logger.info(f"הזמנה בנתיב המהיר עבור {flight_code}: {timings}")
+                return jsonify({'status': 'success', 'message': 'הגעתי לדף ההזמנה. הדפדפן נשאר פתוח.',
+                                'path': 'deal', 'timings': timings})
+            logger.info(f"דף ה-deal של {flight_code} לא נפתח, עובר לבחירה בדף התוצאות")
+        except Exception as e:
+            logger.warning(f"הנתיב המהיר להזמנה נכשל, עובר לבחירה בדף התוצאות: {str(e)}")
+
+    try:
+        if not book_by_click(driver, task, flight_code, flight_index, timings):
+            BOOKING_DRIVER_POOL.release(driver)
+            return jsonify({'status': 'error', 'message': 'טיסה לא נמצאה'})
+        hand_over_booking_driver(driver)
+        logger.info(f"הזמנה דרך דף התוצאות עבור {flight_code}: {timings}")
+        return jsonify({'status': 'success', 'message': 'הגעתי לדף ההזמנה. הדפדפן נשאר פתוח.',
+                        'path': 'click', 'timings': timings})
 
     except Exception as e:
         logger.error(f"שגיאה בתהליך ההזמנה: {str(e)}")
-        driver.quit()
+        BOOKING_DRIVER_POOL.release(driver, discard=True)
         return jsonify({'status': 'error', 'message': 'שגיאה בתהליך ההזמנה'})
 
 @app.route('/reset_cache', methods=['POST'])
 def reset_cache():
-    if os.path.exists(CACHE_FILE):
-        os.remove(CACHE_FILE)
+    if SHARED_STORE:
+        SHARED_STORE.increment(CACHE_GENERATION)
+    if FLIGHT_CACHE.clear():
         logger.debug("קובץ הקאש נמחק")
         return jsonify({'status': 'success', 'message': 'קובץ הקאש נמחק'})
     return jsonify({'status': 'success', 'message': 'אין קובץ קאש למחיקה'})
 
+@app.route('/scrape_stats', methods=['GET'])
+def scrape_stats():
+    return jsonify({
+        'engine': SCRAPE_ENGINE,
+        'engines': engine_stats(),
+        'refresh_pending': REFRESH_WORKERS.pending(),
+        'single_flight': SCRAPE_SINGLE_FLIGHT.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug_captures', methods=['GET'])
+def debug_captures():
+    return jsonify(DEBUG_CAPTURES.list())
+
+@app.route('/debug_captures/<capture_id>', methods=['GET'])
+def debug_capture(capture_id):
+    html = DEBUG_CAPTURES.read(capture_id)
+    if html is None:
+        return jsonify({'status': 'error', 'message': 'הצילום לא נמצא'}), 404
+    # כטקסט ולא כ-HTML, כדי שהסקריפטים של הדף השמור לא ירוצו בדומיין של האפליקציה
+    return Response(html, mimetype='text/plain')
+
+def history_passengers(args):
+    """הנוסעים שלפיהם מסננים את ההיסטוריה (adults/children/infants/eilat_resident, כמו ב-API)"""
+    return search_form_state(args)[2]
+
+@app.route('/flight_changes', methods=['GET'])
+def flight_changes():
+    try:
+        passengers = history_passengers(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        return jsonify(FLIGHT_STORE.changes(request.args.get('flight_code'), request.args.get('date'),
+                                            limit=min(request.args.get('limit', 200, type=int), 1000),
+                                            passengers=passengers))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'פורמט תאריך לא תקין. השתמש ב-dd/mm/yyyy'}), 400
+
+@app.route('/flight_history', methods=['GET'])
+def flight_history():
+    flight_code = request.args.get('flight_code')
+    if not flight_code:
+        return jsonify({'status': 'error', 'message': 'חסר קוד טיסה'}), 400
+    try:
+        passengers = history_passengers(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        return jsonify(FLIGHT_STORE.history(flight_code, request.args.get('date'), passengers=passengers))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'פורמט תאריך לא תקין. השתמש ב-dd/mm/yyyy'}), 400
+
+@app.route('/flight_snapshots', methods=['GET'])
+def flight_snapshots():
+    """תמונת המצב האחרונה ששמורה ב-SQLite לכל יום-מסלול בטווח, בשאילתה אחת ובלי גרידה"""
+    start_date = request.args.get('start_date')
+    if not start_date:
+        return jsonify({'status': 'error', 'message': 'חסר start_date'}), 400
+    try:
+        passengers = history_passengers(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    origin = request.args.get('origin')
+    destination = request.args.get('destination')
+    try:
+        return jsonify(FLIGHT_STORE.latest_for_range(start_date, request.args.get('end_date', start_date),
+                                                     origin.upper() if origin else None,
+                                                     destination.upper() if destination else None,
+                                                     passengers=passengers))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'פורמט תאריך לא תקין. השתמש ב-dd/mm/yyyy'}), 400
+
 @app.route('/add_selected_flight', methods=['POST'])
 def add_selected_flight():
     flight = request.get_json()
-    flight_key = f"{flight['date']}_{flight['origin']}_{flight['destination']}_{flight['direction']}_{flight['index']}"
-    if flight_key not in SELECTED_FLIGHTS:
-        SELECTED_FLIGHTS[flight_key] = flight
-        logger.debug(f"טיסה נוספה לבדיקה כל דקה: {flight_key}")
+    try:
+        key = canonical_key(flight)
+    except (ValueError, KeyError):
+        return jsonify({'status': 'error', 'message': INVALID_FLIGHT_KEY}), 400
+    flight['key'] = key
+    if SELECTED_FLIGHTS.add(key, flight):
+        logger.debug(f"טיסה נוספה לבדיקה כל דקה: {key}")
     return jsonify({'status': 'success', 'message': 'טיסה נוספה לבדיקה'})
 
 @app.route('/remove_selected_flight', methods=['POST'])
 def remove_selected_flight():
     flight = request.get_json()
-    flight_key = f"{flight['date']}_{flight['origin']}_{flight['destination']}_{flight['direction']}_{flight['index']}"
-    if flight_key in SELECTED_FLIGHTS:
-        del SELECTED_FLIGHTS[flight_key]
-        logger.debug(f"טיסה הוסרה מבדיקה כל דקה: {flight_key}")
+    try:
+        key = canonical_key(flight)
+    except (ValueError, KeyError):
+        return jsonify({'status': 'error', 'message': INVALID_FLIGHT_KEY}), 400
+    if SELECTED_FLIGHTS.remove(key):
+        logger.debug(f"טיסה הוסרה מבדיקה כל דקה: {key}")
     return jsonify({'status': 'success', 'message': 'טיסה הוסרה מבדיקה'})
 
+def selected_flights_delta(since):
+    """השינויים ברשימת המעקב מאז גרסה: טיסה מעודכנת, או None עבור טיסה שהוסרה"""
+    version, changed_keys = WATCHLIST_FEED.changes_since(since)
+    if changed_keys is None:
+        return {'version': version, 'reset': True, 'flights': SELECTED_FLIGHTS.snapshot()}
+    selected = SELECTED_FLIGHTS.snapshot()
+    return {'version': version, 'reset': False, 'flights': {key: selected.get(key) for key in changed_keys}}
+
 @app.route('/get_selected_flights', methods=['GET'])
 def get_selected_flights():
-    return jsonify(list(SELECTED_FLIGHTS.values()))
+    since = request.args.get('since', type=int)
+    if since is None:
+        response = jsonify(list(SELECTED_FLIGHTS.snapshot().values()))
+        # ה-ETag מהתוכן עצמו, כדי ש-304 לא יחזיר רשימה שהשתנתה בלי פרסום ב-feed
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+        return response.make_conditional(request)
+
+    # long-poll: מחזיר מיד אם יש שינויים, אחרת ממתין עד wait שניות לשינוי הבא
+    wait = min(request.args.get('wait', 0, type=float), LONG_POLL_TIMEOUT)
+    if wait and WATCHLIST_FEED.version == since:
+        WATCHLIST_FEED.wait(since, wait)
+    return jsonify(selected_flights_delta(since))
+
+@app.route('/selected_flights/stream', methods=['GET'])
+def selected_flights_stream():
+    if not SSE_STREAMS.acquire(blocking=False):
+        # EventSource לא מתחבר מחדש אחרי 503, והדף עובר ל-long-poll
+        return Response('too many update streams', status=503, mimetype='text/plain')
+    # בחיבור מחדש הדפדפן שולח Last-Event-ID, שעדכני יותר מה-since שבכתובת
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', WATCHLIST_FEED.version, type=int)
+
+    def generate(version):
+        while True:
+            if WATCHLIST_FEED.version != version:
+                delta = selected_flights_delta(version)
+                version = delta['version']
+                yield f"id: {version}\nevent: changes\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n"
+            elif not WATCHLIST_FEED.wait(version, SSE_HEARTBEAT_INTERVAL):
+                yield ": keepalive\n\n"
+
+    response = Response(generate(since), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # נקרא כשהחיבור נסגר, גם אם הזרם לא התחיל
+    response.call_on_close(SSE_STREAMS.release)
+    return response
 
 if __name__ == '__main__':
-    selected_monitor_thread = threading.Thread(target=monitor_selected_flights, daemon=True)
-    selected_monitor_thread.start()
+    # להרצה עם כמה עובדים: STATE_BACKEND=sqlite gunicorn -c gunicorn.conf.py app:app
+    start_background_services()
     app.run(host='0.0.0.0', port=8000, debug=False)
     #end
\ No newline at end of file
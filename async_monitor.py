@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from collections import deque, namedtuple
+
+from metrics import timed, SMS_SENT
+
+logger = logging.getLogger(__name__)
+
+SeatChangeEvent = namedtuple('SeatChangeEvent', ['flight_key', 'message'])
+
+
+class TwilioSmsSender:
+    def __init__(self, client, from_number, to_number):
+        self.client = client
+        self.from_number = from_number
+        self.to_number = to_number
+
+    def send(self, message):
+        self.client.messages.create(body=message, from_=self.from_number, to=self.to_number)
+
+
+class StubSmsSender:
+    """שולח מקומי לבדיקות ולעבודה בלי Twilio - רק שומר ורושם ללוג"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+        logger.info(f"SMS (stub): {message}")
+
+
+class MonitorService:
+    """שירות מעקב אסינכרוני: בדיקות מקבילות של קבוצות, ותור אירועים שנצרך ע"י משימת התראות נפרדת"""
+
+    def __init__(self, scheduler, get_groups, fetch_group, apply_result, interval_for_group,
+                 sender=None, executor=None, max_concurrency=3, idle_poll=5,
+                 batch_window=2.0, batch_size=10, max_retries=3, retry_backoff=2.0):
+        self.scheduler = scheduler
+        self.get_groups = get_groups
+        self.fetch_group = fetch_group
+        self.apply_result = apply_result
+        self.interval_for_group = interval_for_group
+        self.sender = sender
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.idle_poll = idle_poll
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._in_flight = set()
+        # המשימות שרצות בלולאה, כדי שלא ייאספו באמצע ושאפשר יהיה לבטל אותן ב-stop
+        self._tasks = set()
+        self._notifier = None
+        self._loop = None
+        self._queue = None
+        self._stopping = None
+        self._stop_requested = False
+        # אירועים שהגיעו לפני שהשירות התחיל לרוץ (הישנים נזרקים אם הוא לא רץ בכלל)
+        self._pending = deque(maxlen=1000)
+
+    def run_forever(self):
+        asyncio.run(self.run())
+
+    def publish(self, events):
+        """מכניס אירועים לתור ההתראות מכל שרשור; לפני שהשירות רץ הם נשמרים עד שיתחיל"""
+        events = list(events)
+        if not events:
+            return
+        loop, queue = self._loop, self._queue
+        if loop is None:
+            self._pending.extend(events)
+            return
+        loop.call_soon_threadsafe(lambda: [queue.put_nowait(event) for event in events])
+
+    def stop(self):
+        """עוצר את השירות מכל שרשור: run מבטל את הבדיקות שבאמצע ואת משימת ההתראות וחוזר"""
+        self._stop_requested = True
+        loop, stopping = self._loop, self._stopping
+        if loop is not None:
+            loop.call_soon_threadsafe(stopping.set)
+
+    async def run(self):
+        queue = asyncio.Queue()
+        while self._pending:
+            queue.put_nowait(self._pending.popleft())
+        self._stopping = asyncio.Event()
+        self._queue = queue
+        self._loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._notifier = asyncio.create_task(self._notify(queue))
+        try:
+            await self._schedule(queue, semaphore)
+        finally:
+            self._loop = self._queue = None
+            tasks = [*self._tasks, self._notifier]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._tasks.clear()
+            self._notifier = None
+
+    async def _schedule(self, queue, semaphore):
+        while not self._stop_requested:
+            groups = self.get_groups()
+            self.scheduler.sync(groups)
+            for group in self.scheduler.due():
+                if group in self._in_flight:
+                    continue
+                # קבוצה שבבדיקה לא נשלחת שוב עד שתתוזמן מחדש בסיום
+                self._in_flight.add(group)
+                self.scheduler.hold(group)
+                task = asyncio.create_task(self._check(group, groups[group], queue, semaphore))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            wait = self.scheduler.seconds_until_next()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.idle_poll if wait is None else min(wait, self.idle_poll))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check(self, group, flight_keys, queue, semaphore):
+        loop = asyncio.get_running_loop()
+        try:
+            async with semaphore:
+                result = await loop.run_in_executor(self.executor, self.fetch_group, group)
+            for event in self.apply_result(group, flight_keys, result):
+                queue.put_nowait(event)
+        except Exception as e:
+            logger.error(f"שגיאה בבדיקת קבוצה {group}: {str(e)}")
+        finally:
+            self._in_flight.discard(group)
+            self.scheduler.reschedule(group, self.interval_for_group(group, flight_keys))
+
+    def _send(self, message):
+        with timed('sms_send'):
+            self.sender.send(message)
+
+    async def _notify(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            for event in batch:
+                logger.debug(f"אירוע מעקב {event.flight_key}: {event.message}")
+            if self.sender is None:
+                continue
+
+            message = '\n'.join(event.message for event in batch)
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    await loop.run_in_executor(None, self._send, message)
+                    SMS_SENT.inc(outcome='ok')
+                    logger.debug(f"SMS נשלח ({len(batch)} אירועים)")
+                    break
+                except Exception as e:
+                    SMS_SENT.inc(outcome='failed')
+                    logger.error(f"שגיאה בשליחת SMS (ניסיון {attempt}/{self.max_retries}): {str(e)}")
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(self.retry_backoff ** attempt)
@@ -0,0 +1,93 @@
+"""שרת HTTP מקומי שמגיש את דפי האתר השמורים באותו מבנה URL של Israir, כדי למדוד בלי לגשת לאתר האמיתי.
+
+הפעלה ידנית:  python -m benchmarks.fixture_server --port 8765
+ואז:          ISRAIR_BASE_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_PATH = '/reservation/search/domestic-flights/he/results'
+DEAL_PATH_PREFIX = '/reservation/deal/'
+
+# דף התוצאות עם כרטיסים, הדף שאחרי בחירת טיסה, ודף השגיאה לכל השאר
+FIXTURES = {
+    'results': 'debug_page_after_selection.html',
+    'deal': 'next_page.html',
+    'error': 'debug_html_error.html',
+}
+
+
+def load_fixtures(root=ROOT, fixtures=FIXTURES):
+    pages = {}
+    for name, filename in fixtures.items():
+        with open(os.path.join(root, filename), 'rb') as f:
+            pages[name] = f.read()
+    return pages
+
+
+class FixtureServer:
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, root=ROOT):
+        pages = load_fixtures(root)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == RESULTS_PATH:
+                    body = pages['results']
+                elif path.startswith(DEAL_PATH_PREFIX):
+                    body = pages['deal']
+                else:
+                    body = pages['error']
+                if delay:
+                    time.sleep(delay)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='שרת פיקסצ\'רים מקומי לדפי Israir')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='השהיה מלאכותית לכל בקשה (שניות)')
+    args = parser.parse_args()
+    server = FixtureServer(args.host, args.port, args.delay)
+    print(f'מגיש פיקסצ\'רים ב-{server.base_url}')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
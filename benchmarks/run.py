@@ -0,0 +1,301 @@
+"""מדידות ביצועים לנתיבי הגרידה, הפענוח והקאש מול שרת פיקסצ'רים מקומי.
+
+python -m benchmarks.run                                 # כל הסוויטות
+python -m benchmarks.run --suite parse --suite cache     # רק חלק
+python -m benchmarks.run --output after.json --compare before.json
+
+סוויטה שחסרה לה תלות (Selenium/Chrome, Flask וכו') מדולגת ונרשמת ב-skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fixture_server import FixtureServer, FIXTURES  # noqa: E402
+
+CACHE_SIZES = (1000, 5000, 10000)
+SEARCH_DAYS = 7
+
+
+class SkipSuite(Exception):
+    pass
+
+
+def bench(fn, rounds=20, warmup=1, setup=None):
+    """מריץ את fn מספר פעמים ומחזיר סטטיסטיקה בשניות, בסגנון pytest-benchmark"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    times = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def summarize(times):
+    return {
+        'rounds': len(times),
+        'min': min(times),
+        'max': max(times),
+        'mean': statistics.mean(times),
+        'median': statistics.median(times),
+        'stddev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def sample_flights(date, count=3):
+    return [{
+        'direction': 'הלוך', 'date': date, 'departure_time': f'{8 + i:02d}:00', 'arrival_time': f'{9 + i:02d}:00',
+        'price': '₪99', 'seats_left': 'נותרו 7 מקומות', 'duration': '1:00', 'flight_code': f'6H{40 + i:03d}',
+        'airline': 'ישראייר', 'origin': 'ETM', 'destination': 'TLV', 'index': i, 'booking_url': None,
+        'last_checked': '12:00:00', 'changed': False, 'is_full': False
+    } for i in range(count)]
+
+
+def suite_parse(ctx):
+    from flight_parser import find_cards, parse_flight_cards
+
+    with open(os.path.join(ROOT, FIXTURES['results']), encoding='utf-8') as f:
+        html = f.read()
+    args = ('23/03/2025', 'ETM', 'TLV', 'הלוך', '12:00:00')
+    return {
+        'parse.find_cards': bench(lambda: find_cards(html), rounds=ctx.rounds),
+        'parse.parse_flight_cards': bench(lambda: parse_flight_cards(html, *args), rounds=ctx.rounds),
+    }
+
+
+def suite_cache(ctx):
+    from flight_cache import FlightCache
+
+    results = {}
+    flights = sample_flights('23/03/2025')
+    for size in CACHE_SIZES:
+        path = os.path.join(ctx.tmpdir, f'cache_{size}.json')
+        cache = FlightCache(path, timedelta(hours=24), max_entries=size, flush_interval=3600)
+        keys = [f'k{i}' for i in range(size)]
+        for key in keys:
+            cache.set(key, flights)
+        cache.flush()
+
+        def write_batch():
+            for key in keys[:100]:
+                cache.set(key, flights)
+
+        def read_batch():
+            for key in keys[-100:]:
+                cache.lookup(key)
+
+        results[f'cache.set_x100[{size}]'] = bench(write_batch, rounds=ctx.rounds)
+        results[f'cache.lookup_x100[{size}]'] = bench(read_batch, rounds=ctx.rounds)
+        results[f'cache.flush[{size}]'] = bench(cache.flush, rounds=max(3, ctx.rounds // 4),
+                                                 setup=lambda: cache.set(keys[0], flights))
+        results[f'cache.load[{size}]'] = bench(lambda: FlightCache(path, timedelta(hours=24), max_entries=size),
+                                                rounds=max(3, ctx.rounds // 4))
+    return results
+
+
+def suite_driver_start(ctx):
+    try:
+        from driver_pool import create_driver
+    except ImportError as e:
+        raise SkipSuite(f'selenium לא מותקן: {e}')
+
+    def start_and_quit():
+        create_driver(headless=True).quit()
+
+    try:
+        start_and_quit()
+    except Exception as e:
+        raise SkipSuite(f'לא ניתן להפעיל Chrome: {e}')
+    return {'driver.start': bench(start_and_quit, rounds=max(3, ctx.rounds // 5), warmup=0)}
+
+
+def app_env(ctx):
+    """משתני הסביבה שמפנים את app.py לשרת הפיקסצ'רים ולקבצי נתונים זמניים"""
+    return {
+        'ISRAIR_BASE_URL': ctx.server.base_url,
+        'CACHE_FILE': os.path.join(ctx.tmpdir, 'app_cache.json'),
+        'FLIGHT_DB_FILE': os.path.join(ctx.tmpdir, 'app_flights.db'),
+        'QUERY_LOG_FILE': os.path.join(ctx.tmpdir, 'app_search_log.jsonl'),
+        'WATCHLIST_FILE': os.path.join(ctx.tmpdir, 'app_watchlist.json'),
+        'STATE_DB_FILE': os.path.join(ctx.tmpdir, 'app_state.db'),
+        'MONITOR_LOCK_FILE': os.path.join(ctx.tmpdir, 'app_monitor.lock'),
+        'SCRAPE_ENGINE': os.environ.get('SCRAPE_ENGINE', 'http'),
+        'SMS_BACKEND': 'stub',
+        'PREWARM_ENABLED': '0',
+        'LOG_LEVEL': 'WARNING',
+    }
+
+
+def load_app(ctx):
+    """טוען את app.py מול שרת הפיקסצ'רים ועם קבצי נתונים זמניים"""
+    if ctx.app is not None:
+        return ctx.app
+    os.environ.update(app_env(ctx))
+    try:
+        import app
+    except ImportError as e:
+        raise SkipSuite(f'תלות של app.py חסרה: {e}')
+    ctx.app = app
+    return app
+
+
+# זמן הייבוא של app.py בתהליך חדש, כמו בעליית עובד gunicorn, ואילו ספריות כבדות נטענו בדרך
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split('.')[0] for name in sys.modules} & {'selenium', 'webdriver_manager', 'twilio'})
+print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))
+"""
+
+
+def suite_startup(ctx):
+    env = dict(os.environ, **app_env(ctx))
+    imports = []
+    heavy = set()
+
+    def start():
+        result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SkipSuite(f'לא ניתן לייבא את app.py: {result.stderr.strip().splitlines()[-1]}')
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        imports.append(report['elapsed'])
+        heavy.update(report['heavy'])
+
+    results = {'startup.process': bench(start, rounds=max(3, ctx.rounds // 4))}
+    # בלי סבב החימום, כמו ב-bench
+    results['startup.import_app'] = summarize(imports[1:])
+    if heavy:
+        print(f'startup: ספריות כבדות שנטענו בעלייה: {", ".join(sorted(heavy))}')
+    return results
+
+
+def suite_scrape(ctx):
+    app = load_app(ctx)
+    from search_params import SearchTask
+
+    task = SearchTask(ctx.date, 'ETM', 'TLV', 'הלוך')
+    return {
+        'scrape_flights.cold': bench(lambda: app.scrape_flights(task, force_refresh=True), rounds=ctx.rounds),
+        'scrape_flights.cached': bench(lambda: app.scrape_flights(task), rounds=ctx.rounds),
+    }
+
+
+def suite_search_post(ctx):
+    app = load_app(ctx)
+    client = app.app.test_client()
+    start = datetime.strptime(ctx.date, '%d/%m/%Y')
+    form = {'start_date': ctx.date, 'end_date': (start + timedelta(days=SEARCH_DAYS - 1)).strftime('%d/%m/%Y')}
+
+    def post():
+        response = client.post('/', data=form)
+        assert response.status_code == 200
+
+    rounds = max(3, ctx.rounds // 4)
+    return {
+        f'search_post.cold[{SEARCH_DAYS}d]': bench(post, rounds=rounds, setup=app.FLIGHT_CACHE.clear),
+        f'search_post.cached[{SEARCH_DAYS}d]': bench(post, rounds=rounds),
+    }
+
+
+SUITES = {
+    'parse': suite_parse,
+    'cache': suite_cache,
+    'driver_start': suite_driver_start,
+    'startup': suite_startup,
+    'scrape': suite_scrape,
+    'search_post': suite_search_post,
+}
+
+
+class Context:
+    def __init__(self, server, tmpdir, rounds):
+        self.server = server
+        self.tmpdir = tmpdir
+        self.rounds = rounds
+        self.date = (datetime.now() + timedelta(days=7)).strftime('%d/%m/%Y')
+        self.app = None
+
+
+def compare(current, baseline, threshold):
+    """משווה חציונים מול תוצאות קודמות; מחזיר את שמות המדידות שהאטו מעבר לסף"""
+    regressions = []
+    for name, stats in sorted(current.items()):
+        before = baseline.get(name)
+        if not before or not before['median']:
+            continue
+        ratio = stats['median'] / before['median']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  <-- האטה'
+            regressions.append(name)
+        print(f'{name:40s} {before["median"] * 1000:10.3f}ms -> {stats["median"] * 1000:10.3f}ms  x{ratio:.2f}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='מדידות ביצועים מול שרת פיקסצ\'רים מקומי')
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), help='סוויטה להרצה (ברירת מחדל: כולן)')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='קובץ JSON של הרצה קודמת להשוואה')
+    parser.add_argument('--threshold', type=float, default=0.1, help='האטה יחסית שנחשבת רגרסיה')
+    parser.add_argument('--delay', type=float, default=0.0, help='השהיה מלאכותית בשרת הפיקסצ\'רים')
+    args = parser.parse_args(argv)
+
+    results, skipped = {}, {}
+    with tempfile.TemporaryDirectory() as tmpdir, FixtureServer(delay=args.delay) as server:
+        ctx = Context(server, tmpdir, args.rounds)
+        for name in args.suite or SUITES:
+            try:
+                suite_results = SUITES[name](ctx)
+            except SkipSuite as e:
+                skipped[name] = str(e)
+                print(f'{name}: דולג ({e})')
+                continue
+            for bench_name, stats in suite_results.items():
+                print(f'{bench_name:40s} median {stats["median"] * 1000:10.3f}ms  (min {stats["min"] * 1000:.3f}ms)')
+            results.update(suite_results)
+        if ctx.app is not None:
+            # לא להשאיר טיימר כתיבה של הקאש שיכתוב לתיקייה הזמנית אחרי שנמחקה
+            ctx.app.FLIGHT_CACHE.clear()
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'benchmarks': results,
+        'skipped': skipped,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'התוצאות נשמרו ב-{args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['benchmarks']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
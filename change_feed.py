@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+
+class ChangeFeed:
+    """מונה גרסאות לרשימת המעקב: מי השתנה מאז גרסה נתונה, והמתנה לשינוי הבא"""
+
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self._version = 0
+        # הגרסה שבה השתנה כל מפתח לאחרונה, מסודר מהישן לחדש
+        self._changed_at = OrderedDict()
+        self._floor = 0
+        self._cond = threading.Condition()
+
+    @property
+    def version(self):
+        with self._cond:
+            return self._version
+
+    def publish(self, *keys):
+        with self._cond:
+            self._version += 1
+            for key in keys:
+                self._changed_at.pop(key, None)
+                self._changed_at[key] = self._version
+            while len(self._changed_at) > self.max_keys:
+                _, version = self._changed_at.popitem(last=False)
+                self._floor = version
+            self._cond.notify_all()
+            return self._version
+
+    def changes_since(self, version):
+        """מחזיר (גרסה נוכחית, מפתחות שהשתנו); None במקום מפתחות אם צריך לשלוח את כל הרשימה מחדש"""
+        with self._cond:
+            if version < self._floor or version > self._version:
+                return self._version, None
+            changed = []
+            for key, changed_version in reversed(self._changed_at.items()):
+                if changed_version <= version:
+                    break
+                changed.append(key)
+            return self._version, changed
+
+    def wait(self, version, timeout):
+        """ממתין עד שהגרסה תעבור את version; מחזיר True אם היה שינוי"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._version != version, timeout)
@@ -0,0 +1,169 @@
+import os
+import re
+import gzip
+import base64
+import time
+import queue
+import random
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+from metrics import DEBUG_CAPTURES
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.html.gz'
+# זמן_סיבה_מפתח, כשהמפתח (שיש בו '/' ועברית) מקודד ב-base64 בטוח ל-URL
+_CAPTURE_ID_RE = re.compile(r'^(\d{8}T\d{12})_([a-z\-]+)_([A-Za-z0-9_\-]+)$')
+
+
+def _encode_key(key):
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_key(encoded):
+    return base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode('utf-8')
+
+
+class DebugCaptures:
+    """טבעת חסומה בדיסק של צילומי HTML דחוסים ב-gzip, לדיבאג של גרידות שנכשלו.
+
+    capture לא כותב בעצמו: הצילום נכנס לתור ושרשור רקע דוחס וכותב אותו, כך
+    שבקשה שנכשלה לא מחכה לדיסק. צילומים נדגמים (sample_rate), מוגבלים לאחד לכל
+    (מפתח, סיבה) בכל min_interval שניות, ונזרקים כשהתור מלא. אחרי כל כתיבה
+    נמחקים הצילומים הישנים ביותר מעבר ל-max_entries או ל-max_bytes.
+    """
+
+    def __init__(self, directory, max_entries=50, max_bytes=20 * 1024 * 1024, sample_rate=1.0,
+                 min_interval=60.0, max_queue=20):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.min_interval = min_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_capture = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _start(self):
+        # השרשור עולה רק בצילום הראשון
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name='debug-capture', daemon=True)
+                self._thread.start()
+
+    def capture(self, key, reason, html):
+        """מכניס צילום לתור; מחזיר False אם דולג (דגימה, הגבלת קצב או תור מלא)"""
+        if html is None:
+            return False
+        if random.random() >= self.sample_rate:
+            DEBUG_CAPTURES.inc(outcome='sampled_out')
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_capture.get((key, reason))
+            if last is not None and now - last < self.min_interval:
+                DEBUG_CAPTURES.inc(outcome='rate_limited')
+                return False
+            self._last_capture[(key, reason)] = now
+            if len(self._last_capture) > 1000:
+                self._last_capture = {k: t for k, t in self._last_capture.items() if now - t < self.min_interval}
+        self._start()
+        try:
+            self._queue.put_nowait((datetime.now(), key, reason, html))
+        except queue.Full:
+            DEBUG_CAPTURES.inc(outcome='dropped')
+            logger.warning(f"תור צילומי הדיבאג מלא, מדלג על {reason} עבור {key}")
+            return False
+        DEBUG_CAPTURES.inc(outcome='queued')
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+                self._trim()
+            except OSError as e:
+                logger.error(f"שגיאה בשמירת צילום דיבאג: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, captured_at, key, reason, html):
+        capture_id = f"{captured_at:%Y%m%dT%H%M%S%f}_{reason}_{_encode_key(key)}"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.capture.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6) as gz:
+                gz.write(html.encode('utf-8'))
+            os.replace(tmp_path, os.path.join(self.directory, capture_id + SUFFIX))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.debug(f"צילום דיבאג נשמר: {capture_id}")
+
+    def _files(self):
+        """(שם, גודל) של כל הצילומים, מהישן לחדש (השם מתחיל בזמן)"""
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(SUFFIX))
+        except FileNotFoundError:
+            return []
+        files = []
+        for name in names:
+            try:
+                files.append((name, os.path.getsize(os.path.join(self.directory, name))))
+            except FileNotFoundError:
+                continue
+        return files
+
+    def _trim(self):
+        files = self._files()
+        total = sum(size for _, size in files)
+        while files and (len(files) > self.max_entries or total > self.max_bytes):
+            name, size = files.pop(0)
+            total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def list(self):
+        """הצילומים השמורים, מהחדש לישן"""
+        captures = []
+        for name, size in reversed(self._files()):
+            capture_id = name[:-len(SUFFIX)]
+            match = _CAPTURE_ID_RE.match(capture_id)
+            if not match:
+                continue
+            captures.append({
+                'id': capture_id,
+                'key': _decode_key(match.group(3)),
+                'reason': match.group(2),
+                'captured_at': datetime.strptime(match.group(1), '%Y%m%dT%H%M%S%f').strftime('%Y-%m-%d %H:%M:%S'),
+                'compressed_bytes': size,
+            })
+        return captures
+
+    def read(self, capture_id):
+        """ה-HTML של צילום; None אם המזהה לא תקין או שהצילום כבר נמחק"""
+        if not _CAPTURE_ID_RE.match(capture_id):
+            return None
+        try:
+            with gzip.open(os.path.join(self.directory, capture_id + SUFFIX), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+
+    def close(self, timeout=5):
+        """ממתין שהצילומים שבתור ייכתבו"""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
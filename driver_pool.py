@@ -0,0 +1,171 @@
+import os
+import logging
+import threading
+from collections import deque
+
+from metrics import timed
+
+# selenium ו-webdriver_manager נטענים רק כשצריך דפדפן, כדי שהעלייה (ומנוע ה-HTTP) לא ישלמו עליהם
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path():
+    """מאתר את נתיב ה-ChromeDriver פעם אחת בלבד לכל התהליך"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is not None:
+            return _driver_path
+
+        driver_path = os.environ.get('CHROMEDRIVER_PATH')
+        if not driver_path:
+            from webdriver_manager.chrome import ChromeDriverManager
+            driver_path = ChromeDriverManager().install()
+        logger.debug(f"נתיב ה-ChromeDriver שנמצא: {driver_path}")
+
+        if not os.path.exists(driver_path):
+            logger.error(f"הקובץ {driver_path} לא נמצא!")
+            raise Exception(f"ChromeDriver לא נמצא בנתיב: {driver_path}")
+
+        if not os.access(driver_path, os.X_OK):
+            logger.warning(f"אין הרשאות הפעלה ל-{driver_path}, מתקן...")
+            os.chmod(driver_path, 0o755)
+
+        _driver_path = driver_path
+        return _driver_path
+
+
+def create_driver(headless=False):
+    """יוצר סשן Chrome חדש על בסיס הנתיב שאותר מראש"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    service = Service(executable_path=resolve_driver_path())
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument(f'user-agent={USER_AGENT}')
+    driver = webdriver.Chrome(service=service, options=options)
+    driver.maximize_window()
+    logger.debug("ChromeDriver נטען בהצלחה")
+    return driver
+
+
+class DriverPoolTimeout(Exception):
+    pass
+
+
+class DriverPool:
+    """מאגר חסום של סשנים חמים של WebDriver עם השאלה והחזרה"""
+
+    def __init__(self, size, headless=True, max_uses=50, driver_factory=None):
+        self.size = size
+        self.headless = headless
+        self.max_uses = max_uses
+        self._factory = driver_factory or (lambda: create_driver(headless=headless))
+        self._idle = deque()
+        self._uses = {}
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _is_healthy(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception as e:
+            logger.warning(f"דרייבר לא תקין, ממחזר: {str(e)}")
+            return False
+
+    def _quit(self, driver):
+        self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"שגיאה בסגירת דרייבר: {str(e)}")
+
+    def _new_driver(self):
+        try:
+            with timed('driver_start'):
+                driver = self._factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        self._uses[id(driver)] = 0
+        return driver
+
+    def acquire(self, timeout=None):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("מאגר הדרייברים נסגר")
+                if self._idle:
+                    driver = self._idle.popleft()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    driver = None
+                    break
+                if not self._cond.wait(timeout):
+                    raise DriverPoolTimeout(f"לא התפנה דרייבר תוך {timeout} שניות")
+
+        if driver is None:
+            return self._new_driver()
+        if not self._is_healthy(driver):
+            self._quit(driver)
+            return self._new_driver()
+        return driver
+
+    def release(self, driver, discard=False):
+        uses = self._uses.get(id(driver), 0) + 1
+        if discard or uses >= self.max_uses or self._closed:
+            if not discard and uses >= self.max_uses:
+                logger.debug(f"דרייבר הגיע ל-{uses} שימושים, ממחזר")
+            self._quit(driver)
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            return
+        self._uses[id(driver)] = uses
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    def detach(self, driver):
+        """מוציא דרייבר מהמאגר בלי לסגור אותו (למשל דפדפן שנשאר פתוח למשתמש)"""
+        self._uses.pop(id(driver), None)
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def warm(self, count=None):
+        """פותח מראש דרייברים כדי שהבקשה הראשונה לא תשלם על עליית Chrome"""
+        drivers = []
+        try:
+            for _ in range(min(count or self.size, self.size)):
+                drivers.append(self.acquire(timeout=0))
+        except DriverPoolTimeout:
+            pass
+        finally:
+            for driver in drivers:
+                self.release(driver)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for driver in idle:
+            self._quit(driver)
+        logger.debug(f"מאגר הדרייברים נסגר ({len(idle)} דרייברים)")
@@ -0,0 +1,257 @@
+import os
+import json
+import fcntl
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from flight_model import Flight, dump_flights, load_flights
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class FlightCache:
+    """קאש בזיכרון לתוצאות גרידה, עם TTL לכל רשומה, פינוי LRU וכתיבה מושהית לדיסק.
+
+    הטיסות נשמרות כ-Flight (בזיכרון ובדיסק בפורמט קומפקטי) ומוחזרות לקוראים כמילונים.
+
+    ttl הוא הגיל המקסימלי של רשומה. אם מוגדר soft_ttl, רשומה שעברה אותו עדיין
+    מוחזרת אבל מסומנת כישנה, כדי שהקורא ירענן אותה ברקע (stale-while-revalidate).
+
+    כשכמה תהליכים מחזיקים קאש על אותו קובץ (shared_file), כל כתיבה ממזגת את הרשומות
+    שבזיכרון עם מה שכבר בקובץ תחת flock, כדי שתהליך אחד לא ימחק את הרשומות של האחרים.
+    generation מחזירה מונה משותף שעולה בכל איפוס; תהליך שרואה מונה חדש מרוקן את
+    הזיכרון שלו ולא כותב אותו חזרה לקובץ.
+    """
+
+    def __init__(self, path, ttl, max_entries=5000, flush_interval=5.0, soft_ttl=None, generation=None,
+                 shared_file=False):
+        self.path = path
+        self.ttl = ttl
+        self.soft_ttl = soft_ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer = None
+        self.generation = generation
+        self._generation = generation() if generation else None
+        self.shared_file = shared_file
+        self.load()
+
+    def _check_generation(self):
+        """מרוקן את הזיכרון אם תהליך אחר איפס את הקאש מאז הבדיקה הקודמת. נקרא תחת המנעול"""
+        if self.generation is None:
+            return
+        current = self.generation()
+        if current != self._generation:
+            logger.debug("הקאש אופס בתהליך אחר, מרוקן את הזיכרון")
+            self._generation = current
+            self._entries.clear()
+            self._dirty = False
+
+    def load(self):
+        """טוען את קובץ הקאש לזיכרון פעם אחת"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logger.error(f"שגיאה בקריאת קובץ הקאש: {str(e)}, מאתחל מחדש")
+            return
+        if not isinstance(raw, dict):
+            logger.warning("קובץ הקאש פגום, מאתחל מחדש")
+            return
+
+        entries = []
+        for key, entry in raw.items():
+            if not isinstance(entry, dict) or 'timestamp' not in entry or ('data' not in entry and 'flights' not in entry):
+                logger.warning(f"מבנה לא תקין בקאש עבור {key}, נתעלם ממנו")
+                continue
+            try:
+                stored_at = datetime.strptime(entry['timestamp'], TIMESTAMP_FORMAT)
+            except ValueError:
+                logger.warning(f"חותמת זמן לא תקינה בקאש עבור {key}, נתעלם ממנה")
+                continue
+            try:
+                # קובץ בפורמט הישן (רשימת מילונים) נטען ונכתב מחדש בפורמט הקומפקטי
+                if 'flights' in entry:
+                    flights = load_flights(entry['flights'])
+                else:
+                    flights = [Flight.from_dict(flight) for flight in entry['data']]
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logger.warning(f"נתוני טיסות לא תקינים בקאש עבור {key}: {str(e)}, נתעלם מהם")
+                continue
+            entries.append((stored_at, key, flights))
+
+        # הרשומות הוותיקות ביותר נכנסות ראשונות כך שהן הראשונות להתפנות
+        entries.sort(key=lambda item: item[0])
+        with self._lock:
+            for stored_at, key, data in entries:
+                self._entries[key] = (stored_at, data)
+            self._evict()
+        logger.debug(f"נטענו {len(entries)} רשומות מקובץ הקאש")
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            logger.debug(f"רשומה {key} פונתה מהקאש (LRU)")
+            self._dirty = True
+
+    def _fresh(self, key):
+        """(גיל, טיסות) של רשומה בתוקף, או None; רשומה שפג תוקפה נמחקת. נקרא תחת המנעול"""
+        self._check_generation()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, data = entry
+        age = datetime.now() - stored_at
+        if age >= self.ttl:
+            del self._entries[key]
+            self._schedule_flush()
+            return None
+        self._entries.move_to_end(key)
+        return age, data
+
+    def lookup(self, key):
+        """מחזיר (עותק של הנתונים, האם ישנים); (None, False) אם אין רשומה או שפג תוקפה"""
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is None:
+                return None, False
+            age, data = entry
+            stale = self.soft_ttl is not None and age >= self.soft_ttl
+            return [flight.to_dict() for flight in data], stale
+
+    def get(self, key):
+        """מחזיר עותק של הנתונים, או None אם אין רשומה או שפג תוקפה"""
+        return self.lookup(key)[0]
+
+    def flights(self, key):
+        """רשומות ה-Flight עצמן (בלי המרה למילונים), לקריאה בלבד; None אם אין רשומה או שפג תוקפה"""
+        with self._lock:
+            entry = self._fresh(key)
+            return list(entry[1]) if entry else None
+
+    def timestamp(self, key):
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def set(self, key, data):
+        self.set_flights(key, [Flight.from_dict(flight) for flight in data])
+
+    def set_flights(self, key, flights):
+        with self._lock:
+            self._check_generation()
+            self._entries[key] = (datetime.now().replace(microsecond=0), list(flights))
+            self._entries.move_to_end(key)
+            self._evict()
+            self._schedule_flush()
+
+    @contextmanager
+    def _locked_file(self):
+        """נעילה בין תהליכים על הקובץ (בקובץ .lock לידו), לכתיבה ולמחיקה"""
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _file_lock(self):
+        return self._locked_file() if self.shared_file else nullcontext()
+
+    def clear(self):
+        """מרוקן את הקאש ומוחק את הקובץ; עם generation - מי שקרא ל-clear כבר הגדיל את המונה"""
+        with self._write_lock, self._file_lock(), self._lock:
+            if self.generation is not None:
+                self._generation = self.generation()
+            self._entries.clear()
+            self._dirty = False
+            if self._flush_timer:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            existed = os.path.exists(self.path)
+            if existed:
+                os.remove(self.path)
+            return existed
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _merge_with_file(self, snapshot):
+        """הרשומות שבקובץ (של תהליכים אחרים) יחד עם snapshot; לכל מפתח נשארת הגרסה החדשה יותר"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                on_disk = json.load(f)
+        except FileNotFoundError:
+            return snapshot
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logger.warning(f"לא ניתן למזג עם קובץ הקאש הקיים: {str(e)}, כותב רק את הרשומות שבזיכרון")
+            return snapshot
+        if not isinstance(on_disk, dict):
+            return snapshot
+
+        # חותמות הזמן בפורמט שממוין כמחרוזת; רשומות שפג תוקפן לא נכתבות שוב
+        oldest = (datetime.now() - self.ttl).strftime(TIMESTAMP_FORMAT)
+        merged = {
+            key: entry for key, entry in on_disk.items()
+            if isinstance(entry, dict) and isinstance(entry.get('timestamp'), str) and entry['timestamp'] >= oldest
+        }
+        for key, entry in snapshot.items():
+            current = merged.get(key)
+            if current is None or current['timestamp'] <= entry['timestamp']:
+                merged[key] = entry
+        if len(merged) > self.max_entries:
+            newest = sorted(merged, key=lambda key: merged[key]['timestamp'], reverse=True)[:self.max_entries]
+            merged = {key: merged[key] for key in newest}
+        return merged
+
+    def _schedule_flush(self):
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """כותב את הקאש לדיסק באופן אטומי (קובץ זמני + rename)"""
+        # הנעילה בין התהליכים נלקחת לפני בדיקת generation, כך שאיפוס לא מתפספס באמצע כתיבה
+        with self._write_lock, self._file_lock():
+            with self._lock:
+                self._flush_timer = None
+                self._check_generation()
+                if not self._dirty:
+                    return
+                snapshot = {
+                    key: {'timestamp': stored_at.strftime(TIMESTAMP_FORMAT), 'flights': dump_flights(data)}
+                    for key, (stored_at, data) in self._entries.items()
+                }
+                self._dirty = False
+
+            if self.shared_file:
+                snapshot = self._merge_with_file(snapshot)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.flight_cache.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                logger.debug(f"הקאש נשמר לדיסק ({len(snapshot)} רשומות)")
+            except OSError as e:
+                logger.error(f"שגיאה בשמירת הקאש: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._schedule_flush()
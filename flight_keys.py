@@ -0,0 +1,75 @@
+"""זהות יציבה לטיסה: (יום-מסלול, קוד טיסה) במקום המיקום של הכרטיס בדף.
+
+מפתח חדש:  23/03/2025_ETM_TLV_הלוך_6H042
+עם נוסעים: 23/03/2025_ETM_TLV_הלוך_p2-1-0_6H042  (רק כשהנוסעים אינם ברירת המחדל)
+בלי קוד:   23/03/2025_ETM_TLV_הלוך_#0      (מיקום, רק כשאין קוד טיסה)
+ישן:       23/03/2025_ETM_TLV_הלוך_0       (נתמך לקריאה ומומר בהוספה/הסרה)
+"""
+from search_params import SearchTask, task_key, parse_task_key
+
+MISSING_CODES = ('N/A', 'לא נמצא קוד טיסה', '', None)
+POSITION_PREFIX = '#'
+
+
+def flight_ident(flight):
+    """החלק המזהה של הטיסה בתוך יום-מסלול: קוד הטיסה, או המיקום אם אין קוד"""
+    code = flight.get('flight_code')
+    if code in MISSING_CODES:
+        return f"{POSITION_PREFIX}{flight.get('index', 0)}"
+    return code
+
+
+def selected_flight_key(flight, task=None):
+    """מפתח הטיסה במעקב; task נותן את הנוסעים (ברירת מחדל אם לא ידוע)"""
+    if task is None:
+        task = SearchTask(flight['date'], flight['origin'], flight['destination'], flight['direction'])
+    return f"{task_key(task)}_{flight_ident(flight)}"
+
+
+def split_flight_key(key):
+    """(SearchTask, מזהה)"""
+    route_key, ident = key.rsplit('_', 1)
+    return parse_task_key(route_key), ident
+
+
+def positional_index(ident):
+    """המיקום עבור מזהה מיקום (חדש '#3' או ישן '3'); None עבור קוד טיסה"""
+    if ident.startswith(POSITION_PREFIX) and ident[1:].isdigit():
+        return int(ident[1:])
+    if ident.isdigit():
+        return int(ident)
+    return None
+
+
+def canonical_key(flight):
+    """מפתח למילון טיסה שהגיע מהדפדפן, כולל מפתח ישן שמכיל רק אינדקס"""
+    key = flight.get('key')
+    if not key:
+        return selected_flight_key(flight)
+    task, ident = split_flight_key(key)
+    if ident.isdigit():
+        # מפתח ישן: לפי קוד הטיסה אם ידוע, אחרת לפי מיקום
+        return selected_flight_key(flight, task) if flight.get('flight_code') not in MISSING_CODES else f"{task_key(task)}_{POSITION_PREFIX}{ident}"
+    return key
+
+
+class SnapshotIndex:
+    """אינדקס של תוצאת גרידה אחת לפי קוד טיסה, לחיפוש O(1) של כל טיסה במעקב"""
+
+    def __init__(self, flights):
+        self.flights = flights
+        self._by_code = {}
+        for flight in flights:
+            code = flight.get('flight_code')
+            if code not in MISSING_CODES:
+                self._by_code.setdefault(code, flight)
+
+    def find(self, ident, watched=None):
+        """הטיסה המתאימה בתמונת המצב; לפי קוד הטיסה השמור (אם יש) גם כשהמפתח ישן"""
+        code = watched.get('flight_code') if watched else None
+        if code not in MISSING_CODES:
+            return self._by_code.get(code)
+        index = positional_index(ident)
+        if index is None:
+            return self._by_code.get(ident)
+        return self.flights[index] if index < len(self.flights) else None
@@ -0,0 +1,284 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+RouteDay = namedtuple('RouteDay', ['date', 'origin', 'destination', 'direction'])
+
+FULL_TEXT = "טיסה מלאה"
+SEATS_TEXT = "נותרו {} מקומות"
+DURATION_TEXT = "{}:{:02d} שעות"
+
+_PRICE_RE = re.compile(r'^₪(\d{1,3}(?:,\d{3})*|\d+)(?:\.(\d{2}))?$')
+_SEATS_RE = re.compile(r'^נותרו (\d+) מקומות$')
+_DURATION_RE = re.compile(r'^(\d+):(\d{2}) שעות$')
+_TIME_RE = re.compile(r'^(\d{2}):(\d{2})$')
+
+# כל השדות של מילון הטיסה, בסדר שבו המפענח מחזיר אותם
+DICT_FIELDS = (
+    'direction', 'date', 'departure_time', 'arrival_time', 'price', 'seats_left', 'duration',
+    'flight_code', 'airline', 'origin', 'destination', 'index', 'booking_url', 'last_checked',
+    'changed', 'is_full'
+)
+
+_FIELD_SET = frozenset(DICT_FIELDS)
+
+_routes = {}
+
+
+def route_day(date, origin, destination, direction):
+    """מופע משותף לכל הטיסות של אותו יום-מסלול, במקום ארבע מחרוזות בכל שורה"""
+    key = (date, origin, destination, direction)
+    route = _routes.get(key)
+    if route is None:
+        route = _routes.setdefault(key, RouteDay(*key))
+    return route
+
+
+@lru_cache(maxsize=4096)
+def parse_price(text):
+    """'₪1,099' -> 109900 אגורות; None אם אין מחיר מספרי"""
+    match = _PRICE_RE.match(text) if isinstance(text, str) else None
+    if not match:
+        return None
+    return int(match.group(1).replace(',', '')) * 100 + int(match.group(2) or 0)
+
+
+@lru_cache(maxsize=4096)
+def format_price(agorot):
+    if agorot is None:
+        return ''
+    shekels, rest = divmod(agorot, 100)
+    return f"₪{shekels:,}" + (f".{rest:02d}" if rest else '')
+
+
+@lru_cache(maxsize=4096)
+def parse_seats(text):
+    """'נותרו 7 מקומות' -> 7, 'טיסה מלאה' -> 0"""
+    if text == FULL_TEXT:
+        return 0
+    match = _SEATS_RE.match(text) if isinstance(text, str) else None
+    return int(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=4096)
+def format_seats(seats):
+    if seats is None:
+        return 'N/A'
+    return FULL_TEXT if seats == 0 else SEATS_TEXT.format(seats)
+
+
+@lru_cache(maxsize=4096)
+def parse_duration(text):
+    """'1:05 שעות' -> 65 דקות"""
+    match = _DURATION_RE.match(text) if isinstance(text, str) else None
+    return int(match.group(1)) * 60 + int(match.group(2)) if match else None
+
+
+@lru_cache(maxsize=4096)
+def format_duration(minutes):
+    return 'N/A' if minutes is None else DURATION_TEXT.format(*divmod(minutes, 60))
+
+
+@lru_cache(maxsize=4096)
+def _minute_of_day(text):
+    match = _TIME_RE.match(text) if isinstance(text, str) else None
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        return None
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+@lru_cache(maxsize=4096)
+def _format_time(moment):
+    return 'N/A' if moment is None else f"{moment.hour:02d}:{moment.minute:02d}"
+
+
+@lru_cache(maxsize=4096)
+def _day_start(date):
+    try:
+        return datetime.strptime(date, '%d/%m/%Y')
+    except (TypeError, ValueError):
+        return None
+
+
+# שדות התצוגה שנבנים מהערכים המספריים (או מיום-המסלול) בלי לבנות את כל המילון
+_TEXT_FIELDS = {
+    'direction': lambda flight: flight.route.direction,
+    'date': lambda flight: flight.route.date,
+    'origin': lambda flight: flight.route.origin,
+    'destination': lambda flight: flight.route.destination,
+    'departure_time': lambda flight: _format_time(flight.departure),
+    'arrival_time': lambda flight: _format_time(flight.arrival),
+    'price': lambda flight: format_price(flight.price_agorot),
+    'seats_left': lambda flight: format_seats(flight.seats),
+    'duration': lambda flight: format_duration(flight.duration_minutes),
+}
+
+
+@dataclass(slots=True, eq=True)
+class Flight:
+    """טיסה אחת בייצוג מספרי: מחיר באגורות, מקומות כמספר, משך בדקות, זמני המראה ונחיתה כ-datetime.
+
+    to_dict מחזיר בדיוק את המילון שממנו נבנתה הטיסה; טקסט שלא משתחזר מהערכים
+    המספריים (למשל 'N/A' או 'אין טיסות') נשמר כמו שהוא ב-raw.
+    """
+    route: RouteDay
+    index: int
+    flight_code: str
+    airline: str
+    departure: datetime = None
+    arrival: datetime = None
+    price_agorot: int = None
+    seats: int = None
+    duration_minutes: int = None
+    is_full: bool = False
+    booking_url: str = None
+    last_checked: str = None
+    changed: bool = False
+    raw: dict = None
+
+    @classmethod
+    def from_dict(cls, flight):
+        route = route_day(flight.get('date'), flight.get('origin'), flight.get('destination'), flight.get('direction'))
+        day = _day_start(route.date) if isinstance(route.date, str) else None
+        departure_time = flight.get('departure_time')
+        arrival_time = flight.get('arrival_time')
+        departure_minute = _minute_of_day(departure_time) if isinstance(departure_time, str) else None
+        arrival_minute = _minute_of_day(arrival_time) if isinstance(arrival_time, str) else None
+        if departure_minute is not None and arrival_minute is not None and arrival_minute < departure_minute:
+            # נחיתה אחרי חצות
+            arrival_minute += 24 * 60
+        departure = day + timedelta(minutes=departure_minute) if day and departure_minute is not None else None
+        arrival = day + timedelta(minutes=arrival_minute) if day and arrival_minute is not None else None
+        price, seats_left, duration = flight.get('price'), flight.get('seats_left'), flight.get('duration')
+
+        parsed = cls(
+            route=route,
+            index=flight.get('index'),
+            flight_code=flight.get('flight_code'),
+            airline=flight.get('airline'),
+            departure=departure,
+            arrival=arrival,
+            price_agorot=parse_price(price) if isinstance(price, str) else None,
+            seats=parse_seats(seats_left) if isinstance(seats_left, str) else None,
+            duration_minutes=parse_duration(duration) if isinstance(duration, str) else None,
+            is_full=flight.get('is_full', False),
+            booking_url=flight.get('booking_url'),
+            last_checked=flight.get('last_checked'),
+            changed=flight.get('changed', False),
+        )
+
+        # כל ערך שלא חוזר בדיוק מהייצוג המספרי (או שדה לא מוכר) נשמר כמו שהוא
+        raw = {}
+        formatted = (
+            ('departure_time', departure_time, _format_time(departure)),
+            ('arrival_time', arrival_time, _format_time(arrival)),
+            ('price', price, format_price(parsed.price_agorot)),
+            ('seats_left', seats_left, format_seats(parsed.seats)),
+            ('duration', duration, format_duration(parsed.duration_minutes)),
+        )
+        keys = flight.keys()
+        for key, original, rebuilt in formatted:
+            if (original != rebuilt or type(original) is not str) and key in keys:
+                raw[key] = original
+        if len(keys) != len(DICT_FIELDS) or keys != _FIELD_SET:
+            for key in keys - _FIELD_SET:
+                raw[key] = flight[key]
+            missing = [key for key in DICT_FIELDS if key not in keys]
+            if missing:
+                raw['_missing'] = missing
+        parsed.raw = raw or None
+        return parsed
+
+    def text(self, field):
+        """שדה תצוגה אחד כמו שהוא מופיע ב-to_dict (None אם השדה חסר)"""
+        if self.raw:
+            if field in self.raw.get('_missing', ()):
+                return None
+            if field in self.raw:
+                return self.raw[field]
+        return _TEXT_FIELDS[field](self)
+
+    def to_dict(self):
+        flight = {
+            'direction': self.route.direction,
+            'date': self.route.date,
+            'departure_time': _format_time(self.departure),
+            'arrival_time': _format_time(self.arrival),
+            'price': format_price(self.price_agorot),
+            'seats_left': format_seats(self.seats),
+            'duration': format_duration(self.duration_minutes),
+            'flight_code': self.flight_code,
+            'airline': self.airline,
+            'origin': self.route.origin,
+            'destination': self.route.destination,
+            'index': self.index,
+            'booking_url': self.booking_url,
+            'last_checked': self.last_checked,
+            'changed': self.changed,
+            'is_full': self.is_full
+        }
+        if self.raw:
+            for key in self.raw.get('_missing', ()):
+                flight.pop(key, None)
+            flight.update((key, value) for key, value in self.raw.items() if key != '_missing')
+        return flight
+
+    def to_compact(self, route_index=0):
+        """שורה קומפקטית ל-JSON; הזמנים בדקות מתחילת יום הטיסה"""
+        day = _day_start(self.route.date)
+        return [
+            route_index, self.index, self.flight_code, self.airline,
+            int((self.departure - day).total_seconds() // 60) if self.departure else None,
+            int((self.arrival - day).total_seconds() // 60) if self.arrival else None,
+            self.price_agorot, self.seats, self.duration_minutes, self.is_full,
+            self.booking_url, self.last_checked, self.changed, self.raw
+        ]
+
+    @classmethod
+    def from_compact(cls, routes, row):
+        (route_index, index, flight_code, airline, departure, arrival, price_agorot, seats,
+         duration_minutes, is_full, booking_url, last_checked, changed, raw) = row
+        route = routes[route_index]
+        day = _day_start(route.date)
+        return cls(
+            route=route,
+            index=index,
+            flight_code=flight_code,
+            airline=airline,
+            departure=day + timedelta(minutes=departure) if departure is not None else None,
+            arrival=day + timedelta(minutes=arrival) if arrival is not None else None,
+            price_agorot=price_agorot,
+            seats=seats,
+            duration_minutes=duration_minutes,
+            is_full=is_full,
+            booking_url=booking_url,
+            last_checked=last_checked,
+            changed=changed,
+            raw=raw,
+        )
+
+
+def dump_flights(flights):
+    """רשימת Flight לייצוג קומפקטי: כל יום-מסלול נשמר פעם אחת"""
+    routes, route_indexes, rows = [], {}, []
+    for flight in flights:
+        route_index = route_indexes.get(flight.route)
+        if route_index is None:
+            route_index = route_indexes[flight.route] = len(routes)
+            routes.append(list(flight.route))
+        rows.append(flight.to_compact(route_index))
+    return {'routes': routes, 'rows': rows}
+
+
+def load_flights(compact):
+    routes = [route_day(*route) for route in compact['routes']]
+    return [Flight.from_compact(routes, row) for row in compact['rows']]
+
+
+def entry_flights(entry):
+    """מילוני הטיסות של רשומת קאש מהדיסק, בפורמט הקומפקטי או בפורמט הישן ('data')"""
+    if 'flights' in entry:
+        return [flight.to_dict() for flight in load_flights(entry['flights'])]
+    return entry['data']
@@ -0,0 +1,197 @@
+import logging
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+CARD_CLASS = 'flight-result-item-card--domestic'
+FULL_SEATS_TEXTS = ["אין מקומות", "0", "מלאה", "לא נמצא מידע על מקומות"]
+DEAL_URL = "https://www.israir.co.il/reservation/deal/searchDomesticFlight/he/{deal_id}"
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'param', 'source', 'track', 'wbr'}
+
+
+class Node:
+    __slots__ = ('tag', 'attrs', 'classes', 'children', 'parts')
+
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.classes = set((attrs.get('class') or '').split())
+        self.children = []
+        # רצף של מחרוזות טקסט וצמתי ילד, לפי הסדר במסמך
+        self.parts = []
+
+    def iter(self):
+        for child in self.children:
+            yield child
+            yield from child.iter()
+
+    def find_all(self, cls):
+        return [node for node in self.iter() if cls in node.classes]
+
+    def find(self, cls):
+        for node in self.iter():
+            if cls in node.classes:
+                return node
+        return None
+
+    def select(self, *classes):
+        """שווה ערך ל-CSS selector של מחלקות מקוננות, למשל '.a .b'"""
+        nodes = [self]
+        for cls in classes:
+            found = []
+            seen = set()
+            for node in nodes:
+                for match in node.find_all(cls):
+                    if id(match) not in seen:
+                        seen.add(id(match))
+                        found.append(match)
+            nodes = found
+        return nodes
+
+    def text(self):
+        chunks = []
+        stack = [iter(self.parts)]
+        while stack:
+            for part in stack[-1]:
+                if isinstance(part, Node):
+                    stack.append(iter(part.parts))
+                    break
+                chunks.append(part)
+            else:
+                stack.pop()
+        return ' '.join(''.join(chunks).split())
+
+
+class _CardCollector(HTMLParser):
+    """בונה עץ רק עבור כרטיסי הטיסות, במעבר אחד על ה-HTML"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.cards = []
+        self._stack = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if not self._stack:
+            if CARD_CLASS not in (attrs.get('class') or '').split():
+                return
+            node = Node(tag, attrs)
+            self.cards.append(node)
+        else:
+            node = Node(tag, attrs)
+            parent = self._stack[-1]
+            parent.children.append(node)
+            parent.parts.append(node)
+        if tag not in VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        if self._stack:
+            node = Node(tag, dict(attrs))
+            self._stack[-1].children.append(node)
+            self._stack[-1].parts.append(node)
+
+    def handle_endtag(self, tag):
+        if not self._stack:
+            return
+        # סגירה סלחנית: מוציאים מהמחסנית עד לתג התואם
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        if self._stack:
+            self._stack[-1].parts.append(data)
+
+
+def find_cards(html):
+    collector = _CardCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.cards
+
+
+def _required(card, *classes):
+    nodes = card.select(*classes)
+    if not nodes:
+        raise ValueError(f"לא נמצא אלמנט {' '.join(classes)}")
+    return nodes[0]
+
+
+def _last_span(node):
+    children = node.children
+    if not children or children[-1].tag != 'span':
+        raise ValueError("לא נמצא אלמנט המחיר")
+    return children[-1]
+
+
+def booking_url_from_button(attrs):
+    deal_id = attrs.get('data-deal-id')
+    if deal_id:
+        return DEAL_URL.format(deal_id=deal_id)
+    onclick = attrs.get('onclick')
+    if onclick and 'window.open' in onclick:
+        start = onclick.find("'") + 1
+        end = onclick.find("'", start)
+        return onclick[start:end]
+    return None
+
+
+def parse_card(card, index, date, origin, destination, direction, current_time):
+    time_blocks = card.select('flight-text-block--primary', 'flight-text-block__bottom-text--primary')
+    departure_time = time_blocks[0].text() if len(time_blocks) > 0 else "לא נמצא זמן"
+    arrival_time = time_blocks[1].text() if len(time_blocks) > 1 else "לא נמצא זמן הגעה"
+
+    price = _last_span(_required(card, 'flight-result-price__top--domestic')).text()
+
+    seats_left = _required(card, 'purchase-block-button-group__top').text()
+    is_full = seats_left in FULL_SEATS_TEXTS
+    if is_full:
+        seats_left = "טיסה מלאה"
+
+    duration = _required(card, 'flight-text-block--sm', 'flight-text-block__top-text--primary').text()
+
+    flight_code_text = _required(card, 'flight-text-block__top-text--powered-by').text()
+    flight_code = flight_code_text.split('[')[-1].split(']')[0] if '[' in flight_code_text else "לא נמצא קוד טיסה"
+
+    airline = _required(card, 'flight-text-block__bottom-text--powered-by', 'dib').text()
+
+    select_button = card.find('purchase-block-button-group__button')
+    booking_url = booking_url_from_button(select_button.attrs) if select_button else None
+
+    return {
+        'direction': direction,
+        'date': date,
+        'departure_time': departure_time,
+        'arrival_time': arrival_time,
+        'price': price,
+        'seats_left': seats_left,
+        'duration': duration,
+        'flight_code': flight_code,
+        'airline': airline,
+        'origin': origin,
+        'destination': destination,
+        'index': index,
+        'booking_url': booking_url,
+        'last_checked': current_time,
+        'changed': False,
+        'is_full': is_full
+    }
+
+
+def parse_cards(cards, date, origin, destination, direction, current_time):
+    flight_data = []
+    for index, card in enumerate(cards):
+        try:
+            flight_data.append(parse_card(card, index, date, origin, destination, direction, current_time))
+        except ValueError as e:
+            logger.error(f"שגיאה בחילוץ פרטי טיסה {index}: {str(e)}")
+    return flight_data
+
+
+def parse_flight_cards(html, date, origin, destination, direction, current_time):
+    """מחלץ את כל כרטיסי הטיסות מ-HTML של דף התוצאות, בלי דפדפן"""
+    return parse_cards(find_cards(html), date, origin, destination, direction, current_time)
@@ -1,12 +1,16 @@
 import json
-import time
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException
+from page_readiness import wait_until, results_ready, network_idle
+from debug_capture import DebugCaptures
+
+# הדפים שנשמרים לדיבאג, דחוסים ובטבעת חסומה (ולא קבצי HTML שדורסים זה את זה)
+CAPTURES = DebugCaptures("debug_captures", min_interval=0)
+CAPTURE_KEY = "23/03/2025_ETM_TLV_הלוך"
 
 def setup_driver():
     """הגדרת הדרייבר של Chrome עם אפשרויות מתאימות"""
@@ -43,16 +47,13 @@ def scrape_flights_and_proceed():
 
     # המתנה לטעינת הדף ולזיהוי אלמנטים
     try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".flight-result-item-card--domestic"))
-        )
+        wait_until(driver, results_ready(), timeout=20)
         print("כרטיסי הטיסות נטענו בהצלחה.")
     except TimeoutException:
         print("חריגה מזמן ההמתנה: כרטיסי הטיסות לא נמצאו.")
         print("תוכן הדף שנטען:")
-        with open("debug_page.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
-        print("ה-HTML נשמר ל-debug_page.html")
+        CAPTURES.capture(CAPTURE_KEY, "timeout", driver.page_source)
+        print("ה-HTML נשמר ל-debug_captures/")
         driver.quit()
         return []
 
@@ -115,31 +116,34 @@ def scrape_flights_and_proceed():
             driver.quit()
             return flights
 
-        # המתנה קצרה לאחר הלחיצה
-        time.sleep(2)
-
         # לחיצה על "המשיכו לפרטים והזמנה"
         try:
-            continue_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'reservation-domestic-flights-booking--btn')]"))
+            # ההמתנה ללחיצות מחליפה את ההשהיה הקבועה אחרי בחירת הטיסה
+            continue_button = wait_until(
+                driver,
+                EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'reservation-domestic-flights-booking--btn')]")),
+                timeout=10
             )
+            results_url = driver.current_url
             continue_button.click()
             print("לחצתי על 'המשיכו לפרטים והזמנה'.")
         except TimeoutException as e:
             print(f"שגיאה בלחיצה על 'המשיכו לפרטים והזמנה': {e}")
             print("תוכן הדף לאחר בחירת הטיסה:")
-            with open("debug_page_after_selection.html", "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-            print("ה-HTML נשמר ל-debug_page_after_selection.html")
+            CAPTURES.capture(CAPTURE_KEY, "after-selection", driver.page_source)
+            print("ה-HTML נשמר ל-debug_captures/")
             driver.quit()
             return flights
 
         # המתנה לטעינת הדף הבא
-        time.sleep(3)
+        try:
+            wait_until(driver, EC.url_changes(results_url), timeout=10)
+            wait_until(driver, network_idle(), timeout=10)
+        except TimeoutException:
+            print("הדף הבא לא סיים להיטען בזמן, שומר את מה שיש.")
         print("הגעתי לדף הבא. תוכן הדף:")
-        with open("next_page.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
-        print("ה-HTML של הדף הבא נשמר ל-next_page.html")
+        CAPTURES.capture(CAPTURE_KEY, "next-page", driver.page_source)
+        print("ה-HTML של הדף הבא נשמר ל-debug_captures/")
 
     driver.quit()
     return flights
@@ -148,6 +152,7 @@ def main():
     """פונקציה ראשית להרצת הסקריפט"""
     print("מתחיל לגרד טיסות...")
     flights = scrape_flights_and_proceed()
+    CAPTURES.close()
     
     if not flights:
         print("לא נמצאו טיסות או שהייתה שגיאה בגרידה.")
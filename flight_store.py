@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+from flight_model import entry_flights
+from search_params import DEFAULT_PASSENGERS, passengers_suffix, parse_task_key
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scrapes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    flight_date TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    scraped_at TEXT NOT NULL,
+    passengers TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_scrapes_route_day ON scrapes (flight_date, origin, destination);
+
+CREATE TABLE IF NOT EXISTS flight_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scrape_id INTEGER NOT NULL REFERENCES scrapes(id),
+    flight_index INTEGER NOT NULL,
+    flight_code TEXT,
+    departure_time TEXT,
+    arrival_time TEXT,
+    price TEXT,
+    seats_left TEXT,
+    duration TEXT,
+    airline TEXT,
+    booking_url TEXT,
+    is_full INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_scrape ON flight_snapshots (scrape_id);
+CREATE INDEX IF NOT EXISTS idx_snapshots_flight_code ON flight_snapshots (flight_code);
+
+CREATE TABLE IF NOT EXISTS flight_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scrape_id INTEGER NOT NULL REFERENCES scrapes(id),
+    flight_code TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_changes_scrape ON flight_changes (scrape_id);
+CREATE INDEX IF NOT EXISTS idx_changes_flight_code ON flight_changes (flight_code);
+'''
+
+
+def to_iso_date(date):
+    """ממיר תאריך בפורמט dd/mm/yyyy לפורמט שאפשר למיין (yyyy-mm-dd)"""
+    return datetime.strptime(date, '%d/%m/%Y').strftime('%Y-%m-%d')
+
+
+def from_iso_date(iso_date):
+    return datetime.strptime(iso_date, '%Y-%m-%d').strftime('%d/%m/%Y')
+
+
+class FlightStore:
+    """מאגר SQLite (מצב WAL) לתמונות מצב של טיסות, כולל היסטוריית מחירים ומקומות"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(scrapes)')]
+        if 'passengers' not in columns:
+            # מאגר מלפני שהנוסעים נכנסו למפתח: כל הגרידות הקיימות היו עם ברירת המחדל
+            conn.execute("ALTER TABLE scrapes ADD COLUMN passengers TEXT NOT NULL DEFAULT ''")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def record_snapshot(self, date, origin, destination, direction, flights, scraped_at=None, changes=(),
+                        passengers=DEFAULT_PASSENGERS):
+        """מוסיף תמונת מצב חדשה של יום-מסלול (והשינויים מהקודמת); שורות קודמות לא נדרסות"""
+        scraped_at = (scraped_at or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        rows = [flight for flight in flights if flight.get('flight_code') not in (None, 'N/A')]
+        conn = self._connection()
+        with self._write_lock, conn:
+            cursor = conn.execute(
+                'INSERT INTO scrapes (flight_date, origin, destination, direction, scraped_at, passengers) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (to_iso_date(date), origin, destination, direction, scraped_at, passengers_suffix(passengers))
+            )
+            scrape_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO flight_snapshots (scrape_id, flight_index, flight_code, departure_time, arrival_time, '
+                'price, seats_left, duration, airline, booking_url, is_full) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(scrape_id, flight.get('index', 0), flight.get('flight_code'), flight.get('departure_time'),
+                  flight.get('arrival_time'), flight.get('price'), flight.get('seats_left'), flight.get('duration'),
+                  flight.get('airline'), flight.get('booking_url'), int(bool(flight.get('is_full'))))
+                 for flight in rows]
+            )
+            conn.executemany(
+                'INSERT INTO flight_changes (scrape_id, flight_code, kind, old_value, new_value) VALUES (?, ?, ?, ?, ?)',
+                [(scrape_id, change.flight_code, change.kind, change.old, change.new) for change in changes]
+            )
+        return scrape_id
+
+    def latest_for_range(self, start_date, end_date, origin=None, destination=None, passengers=DEFAULT_PASSENGERS):
+        """מחזיר את תמונת המצב האחרונה של כל יום-מסלול בטווח (לאותם נוסעים), בשאילתה אחת על האינדקס"""
+        query = '''
+            SELECT s.flight_date, s.origin, s.destination, s.direction, s.scraped_at, f.*
+            FROM scrapes s
+            JOIN (
+                SELECT flight_date, origin, destination, direction, MAX(id) AS scrape_id
+                FROM scrapes
+                WHERE flight_date BETWEEN ? AND ? AND passengers = ?
+                {route_filter}
+                GROUP BY flight_date, origin, destination, direction
+            ) latest ON latest.scrape_id = s.id
+            JOIN flight_snapshots f ON f.scrape_id = s.id
+            ORDER BY s.flight_date, s.direction, f.flight_index
+        '''
+        params = [to_iso_date(start_date), to_iso_date(end_date), passengers_suffix(passengers)]
+        route_filter = ''
+        if origin:
+            route_filter += ' AND origin = ?'
+            params.append(origin)
+        if destination:
+            route_filter += ' AND destination = ?'
+            params.append(destination)
+        rows = self._connection().execute(query.format(route_filter=route_filter), params).fetchall()
+        return [self._row_to_flight(row) for row in rows]
+
+    def history(self, flight_code, date=None, passengers=DEFAULT_PASSENGERS):
+        """היסטוריית מקומות ומחיר של טיסה לאורך הזמן, לגרידות עם אותם נוסעים"""
+        query = '''
+            SELECT s.scraped_at, s.flight_date, f.seats_left, f.price, f.is_full
+            FROM flight_snapshots f
+            JOIN scrapes s ON s.id = f.scrape_id
+            WHERE f.flight_code = ? AND s.passengers = ?
+        '''
+        params = [flight_code, passengers_suffix(passengers)]
+        if date:
+            query += ' AND s.flight_date = ?'
+            params.append(to_iso_date(date))
+        query += ' ORDER BY s.scraped_at'
+        rows = self._connection().execute(query, params).fetchall()
+        return [{
+            'scraped_at': row['scraped_at'],
+            'date': from_iso_date(row['flight_date']),
+            'seats_left': row['seats_left'],
+            'price': row['price'],
+            'is_full': bool(row['is_full'])
+        } for row in rows]
+
+    def changes(self, flight_code=None, date=None, limit=200, passengers=DEFAULT_PASSENGERS):
+        """אירועי השינוי האחרונים (מקומות, מחיר, טיסות שנוספו/הוסרו), מהחדש לישן, לאותם נוסעים"""
+        query = '''
+            SELECT s.scraped_at, s.flight_date, s.origin, s.destination, s.direction,
+                   c.flight_code, c.kind, c.old_value, c.new_value
+            FROM flight_changes c
+            JOIN scrapes s ON s.id = c.scrape_id
+            WHERE s.passengers = ?
+        '''
+        params = [passengers_suffix(passengers)]
+        if flight_code:
+            query += ' AND c.flight_code = ?'
+            params.append(flight_code)
+        if date:
+            query += ' AND s.flight_date = ?'
+            params.append(to_iso_date(date))
+        query += ' ORDER BY c.id DESC LIMIT ?'
+        params.append(limit)
+        rows = self._connection().execute(query, params).fetchall()
+        return [{
+            'changed_at': row['scraped_at'],
+            'date': from_iso_date(row['flight_date']),
+            'origin': row['origin'],
+            'destination': row['destination'],
+            'direction': row['direction'],
+            'flight_code': row['flight_code'],
+            'kind': row['kind'],
+            'old': row['old_value'],
+            'new': row['new_value']
+        } for row in rows]
+
+    def _row_to_flight(self, row):
+        return {
+            'direction': row['direction'],
+            'date': from_iso_date(row['flight_date']),
+            'departure_time': row['departure_time'],
+            'arrival_time': row['arrival_time'],
+            'price': row['price'],
+            'seats_left': row['seats_left'],
+            'duration': row['duration'],
+            'flight_code': row['flight_code'],
+            'airline': row['airline'],
+            'origin': row['origin'],
+            'destination': row['destination'],
+            'index': row['flight_index'],
+            'booking_url': row['booking_url'],
+            'last_checked': row['scraped_at'].split(' ')[1],
+            'changed': False,
+            'is_full': bool(row['is_full'])
+        }
+
+    def import_json_cache(self, cache_file):
+        """מיגרציה: מייבא את flight_cache.json הקיים כתמונות מצב"""
+        if not os.path.exists(cache_file):
+            return 0
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            logger.warning(f"{cache_file} אינו בפורמט קאש, לא יובא")
+            return 0
+
+        imported = 0
+        for cache_key, entry in sorted(cache.items(), key=lambda item: item[1].get('timestamp', '')):
+            try:
+                task = parse_task_key(cache_key)
+                scraped_at = datetime.strptime(entry['timestamp'], '%Y-%m-%d %H:%M:%S')
+                self.record_snapshot(task.date, task.origin, task.destination, task.direction, entry_flights(entry),
+                                     scraped_at, passengers=task.passengers)
+                imported += 1
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"דילוג על רשומת קאש {cache_key}: {str(e)}")
+        logger.debug(f"יובאו {imported} רשומות מ-{cache_file}")
+        return imported
+
+    def is_empty(self):
+        return self._connection().execute('SELECT 1 FROM scrapes LIMIT 1').fetchone() is None
+
+
+if __name__ == '__main__':
+    # שימוש: python flight_store.py [flight_cache.json] [flights.db]
+    logging.basicConfig(level=logging.DEBUG)
+    cache_file = sys.argv[1] if len(sys.argv) > 1 else 'flight_cache.json'
+    db_file = sys.argv[2] if len(sys.argv) > 2 else 'flights.db'
+    count = FlightStore(db_file).import_json_cache(cache_file)
+    print(f"יובאו {count} רשומות מ-{cache_file} אל {db_file}")
@@ -0,0 +1,28 @@
+"""הרצה עם כמה עובדים:  gunicorn -c gunicorn.conf.py app:app
+
+כל עובד טוען את app.py בנפרד (בלי preload), כך שלכל אחד מאגר דרייברים משלו.
+רשימת המעקב והחיפושים האחרונים משותפים דרך SQLite, ורק העובד שמחזיק בנעילת
+המעקב מריץ את הבדיקות ואת חימום הקאש.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault('STATE_BACKEND', 'sqlite')
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+# חיבורי SSE ו-long-poll מחזיקים שרשור כל אחד, אז עובדים עם שרשורים ולא sync.
+# כל דף פתוח מחזיק חיבור SSE אחד לאורך כל חייו; app.py מגביל אותם ל-SSE_MAX_STREAMS לכל עובד
+# (מעבר לזה הדף עובר ל-long-poll), ו-threads הוא התקרה הזו ועוד שרשורים לבקשות הרגילות.
+# כלומר כל עובד משרת עד SSE_MAX_STREAMS דפים פתוחים בזרם בלי לעכב חיפושים.
+worker_class = 'gthread'
+sse_streams = int(os.environ.setdefault('SSE_MAX_STREAMS', '32'))
+threads = int(os.environ.get('GUNICORN_THREADS', sse_streams + 16))
+timeout = 120
+graceful_timeout = 30
+preload_app = False
+
+
+def post_worker_init(worker):
+    import app as flight_app
+    flight_app.start_background_services()
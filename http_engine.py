@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from driver_pool import USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+
+class FastPathFailed(Exception):
+    pass
+
+
+class HttpEngine:
+    """מנוע גרידה מהיר: בקשת HTTP על סשן keep-alive משותף, בלי דפדפן"""
+
+    def __init__(self, timeout=10, pool_size=10, failure_threshold=3, cooldown=600):
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'he-IL,he;q=0.9,en;q=0.8',
+        })
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._disabled_until = 0.0
+
+    def available(self):
+        """אחרי כמה כישלונות רצופים המנוע מושבת זמנית כדי לא לשלם על בקשה מיותרת בכל גרידה"""
+        with self._lock:
+            return time.monotonic() >= self._disabled_until
+
+    def _record(self, ok):
+        with self._lock:
+            if ok:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._disabled_until = time.monotonic() + self.cooldown
+                self._consecutive_failures = 0
+                logger.warning(f"המנוע המהיר נכשל {self.failure_threshold} פעמים ברצף, מושבת ל-{self.cooldown} שניות")
+
+    def fetch(self, url, parse):
+        """מביא את הדף ומפענח אותו; זורק FastPathFailed אם צריך לחזור ל-Selenium"""
+        try:
+            response = self._session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self._record(False)
+            raise FastPathFailed(f"שגיאת HTTP: {str(e)}")
+
+        result = parse(response.text)
+        if not result:
+            # הדף כנראה מרונדר בצד הלקוח ואין בו כרטיסים
+            self._record(False)
+            raise FastPathFailed("לא נמצאו כרטיסי טיסה בתשובת ה-HTTP")
+        self._record(True)
+        return result
+
+    def close(self):
+        self._session.close()
+
@@ -0,0 +1,174 @@
+import bisect
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # לכל צירוף תוויות: [מונים לכל דלי (לא מצטברים), סכום, כמות]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def summary(self):
+        """כמות, סכום וממוצע לכל צירוף תוויות - לתצוגת JSON"""
+        with self._lock:
+            return {
+                key: {'count': count, 'total_seconds': total, 'avg_seconds': total / count if count else 0.0}
+                for key, (_, total, count) in self._series.items()
+            }
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._series.items()}
+        for key, (buckets, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, buckets):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help_text, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help_text):
+        return self._register(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """כל המדדים בפורמט הטקסט של Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram('flight_app_span_seconds', 'Duration of scrape pipeline steps')
+CACHE_REQUESTS = REGISTRY.counter('flight_app_cache_requests_total', 'Flight cache lookups by result (hit, stale, miss)')
+SCRAPES = REGISTRY.counter('flight_app_scrapes_total', 'Route-day scrapes by engine and outcome')
+SCRAPE_SECONDS = REGISTRY.histogram('flight_app_scrape_seconds', 'Route-day scrape duration by engine')
+CARDS_PARSED = REGISTRY.counter('flight_app_cards_parsed_total', 'Flight cards parsed by engine')
+SCRAPES_COALESCED = REGISTRY.counter('flight_app_scrapes_coalesced_total', 'Route-day scrapes saved by joining a concurrent scrape of the same key')
+SMS_SENT = REGISTRY.counter('flight_app_sms_total', 'SMS send attempts by outcome')
+DEBUG_CAPTURES = REGISTRY.counter('flight_app_debug_captures_total', 'Debug page captures by outcome (queued, sampled_out, rate_limited, dropped)')
+
+
+def timed(span):
+    """מדידת שלב בצנרת הגרידה (עליית דרייבר, טעינת דף, המתנה, פענוח, קאש, SMS)"""
+    return SPAN_SECONDS.time(span=span)
+
+
+@contextmanager
+def timed_into(span, timings):
+    """כמו timed, ושומר גם את משך השלב ב-timings[span], למשל כדי להחזיר אותו בתשובה"""
+    start = time.perf_counter()
+    try:
+        with timed(span):
+            yield
+    finally:
+        timings[span] = round(time.perf_counter() - start, 3)
+
+
+def record_scrape(engine, seconds, ok, cards=0):
+    SCRAPES.inc(engine=engine, outcome='ok' if ok else 'failed')
+    SCRAPE_SECONDS.observe(seconds, engine=engine)
+    if cards:
+        CARDS_PARSED.inc(cards, engine=engine)
+
+
+def engine_stats():
+    """סיכום לכל מנוע גרידה: כמות, כישלונות וזמן ממוצע"""
+    stats = {}
+    for key, summary in SCRAPE_SECONDS.summary().items():
+        engine = dict(key)['engine']
+        stats[engine] = dict(summary, failures=SCRAPES.value(engine=engine, outcome='failed'))
+    return stats
+
+
+def sampled(rate):
+    """האם לרשום את האירוע הזה ללוג - לרישום מדגמי של נתונים כבדים"""
+    return rate >= 1 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,81 @@
+import random
+import time
+from datetime import datetime
+
+from flight_keys import split_flight_key
+
+
+def group_selected_flights(selected_flights):
+    """מקבץ טיסות במעקב לפי יום-מסלול (כולל נוסעים) כך שכל קבוצה נגרדת פעם אחת"""
+    groups = {}
+    for flight_key in selected_flights:
+        task, _ = split_flight_key(flight_key)
+        groups.setdefault(task, []).append(flight_key)
+    return groups
+
+
+def departure_datetime(date, departure_time):
+    try:
+        return datetime.strptime(f"{date} {departure_time}", '%d/%m/%Y %H:%M')
+    except (TypeError, ValueError):
+        try:
+            return datetime.strptime(date, '%d/%m/%Y')
+        except ValueError:
+            return None
+
+
+def interval_for(departure, base_interval, now=None):
+    """טיסות קרובות נבדקות לעיתים קרובות יותר; טיסות רחוקות - לעיתים רחוקות"""
+    if departure is None:
+        return base_interval
+    hours_left = (departure - (now or datetime.now())).total_seconds() / 3600
+    if hours_left < 0:
+        return base_interval * 60
+    if hours_left <= 24:
+        return base_interval
+    if hours_left <= 72:
+        return base_interval * 2
+    if hours_left <= 168:
+        return base_interval * 5
+    return base_interval * 10
+
+
+class MonitorScheduler:
+    """מתזמן קבוצות מעקב לאורך המרווח עם ג'יטר, במקום לבדוק הכל יחד כל דקה"""
+
+    def __init__(self, base_interval=60, jitter=0.2, rng=None):
+        self.base_interval = base_interval
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+        self._next_due = {}
+
+    def sync(self, groups, now=None):
+        """מוסיף קבוצות חדשות (עם היסט אקראי כדי לפזר עומס) ומסיר קבוצות שכבר לא במעקב"""
+        now = time.time() if now is None else now
+        for group in list(self._next_due):
+            if group not in groups:
+                del self._next_due[group]
+        for group in groups:
+            if group not in self._next_due:
+                self._next_due[group] = now + self._rng.uniform(0, self.base_interval * self.jitter)
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return sorted((group for group, due_at in self._next_due.items() if due_at <= now),
+                      key=lambda group: self._next_due[group])
+
+    def reschedule(self, group, interval, now=None):
+        now = time.time() if now is None else now
+        spread = interval * self.jitter
+        self._next_due[group] = now + interval + self._rng.uniform(-spread, spread)
+
+    def hold(self, group):
+        """מוציא קבוצה מהתור עד לתזמון הבא שלה (למשל בזמן שהיא בבדיקה)"""
+        if group in self._next_due:
+            self._next_due[group] = float('inf')
+
+    def seconds_until_next(self, now=None):
+        now = time.time() if now is None else now
+        if not self._next_due:
+            return None
+        return max(0.0, min(self._next_due.values()) - now)
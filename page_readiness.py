@@ -0,0 +1,99 @@
+import os
+import time
+
+POLL_INTERVAL = float(os.environ.get('READINESS_POLL_INTERVAL', 0.1))
+STABLE_FOR = float(os.environ.get('READINESS_STABLE_FOR', 0.3))
+NETWORK_IDLE_FOR = float(os.environ.get('READINESS_NETWORK_IDLE_FOR', 0.5))
+
+CARD_SELECTOR = '.flight-result-item-card--domestic'
+SEATS_SELECTOR = '.purchase-block-button-group__top'
+
+# תמונת מצב של הדף בקריאת JS אחת לכל סבב בדיקה, במקום כמה find_elements
+_PAGE_STATE_SCRIPT = '''
+var cards = document.querySelectorAll(arguments[0]);
+var populated = 0;
+for (var i = 0; i < cards.length; i++) {
+    var el = cards[i].querySelector(arguments[1]);
+    if (el && el.textContent.trim()) { populated++; }
+}
+var resources = window.performance && performance.getEntriesByType ? performance.getEntriesByType('resource').length : 0;
+return [cards.length, populated, resources, document.readyState];
+'''
+
+
+class _Stable:
+    """עוזר למעקב אחרי ערך שצריך להישאר קבוע לאורך פרק זמן"""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self._value = None
+        self._since = None
+
+    def update(self, value):
+        now = time.monotonic()
+        if value != self._value or self._since is None:
+            self._value = value
+            self._since = now
+            return False
+        return now - self._since >= self.duration
+
+
+class card_count_stable:
+    """מספר הכרטיסים גדול מאפס ולא השתנה במשך stable_for שניות"""
+
+    def __init__(self, card_selector=CARD_SELECTOR, stable_for=STABLE_FOR):
+        self.card_selector = card_selector
+        self._stable = _Stable(stable_for)
+
+    def __call__(self, driver):
+        count = driver.execute_script('return document.querySelectorAll(arguments[0]).length;', self.card_selector)
+        return count > 0 and self._stable.update(count)
+
+
+class elements_populated:
+    """בכל כרטיס יש טקסט באלמנט הפנימי (למשל מספר המקומות)"""
+
+    def __init__(self, card_selector=CARD_SELECTOR, inner_selector=SEATS_SELECTOR):
+        self.card_selector = card_selector
+        self.inner_selector = inner_selector
+
+    def __call__(self, driver):
+        count, populated, _, _ = driver.execute_script(_PAGE_STATE_SCRIPT, self.card_selector, self.inner_selector)
+        return count > 0 and populated == count
+
+
+class network_idle:
+    """המסמך נטען ולא נוספו בקשות רשת חדשות במשך idle_for שניות"""
+
+    def __init__(self, idle_for=NETWORK_IDLE_FOR):
+        self._stable = _Stable(idle_for)
+
+    def __call__(self, driver):
+        ready_state, resources = driver.execute_script(
+            "return [document.readyState, window.performance && performance.getEntriesByType ? "
+            "performance.getEntriesByType('resource').length : 0];"
+        )
+        return ready_state == 'complete' and self._stable.update(resources)
+
+
+class results_ready:
+    """דף התוצאות מוכן: לפחות כרטיס אחד מאוכלס, ומספר הכרטיסים והמאוכלסים לא השתנה במשך stable_for.
+
+    לא מחכים שכל הכרטיסים יאוכלסו: כרטיס פגום לא צריך לעכב את הגרידה עד ה-timeout,
+    והמפענח מדלג עליו. בקריאת JS אחת לכל סבב.
+    """
+
+    def __init__(self, card_selector=CARD_SELECTOR, inner_selector=SEATS_SELECTOR, stable_for=STABLE_FOR):
+        self.card_selector = card_selector
+        self.inner_selector = inner_selector
+        self._stable = _Stable(stable_for)
+
+    def __call__(self, driver):
+        count, populated, _, _ = driver.execute_script(_PAGE_STATE_SCRIPT, self.card_selector, self.inner_selector)
+        return populated > 0 and self._stable.update((count, populated))
+
+
+def wait_until(driver, condition, timeout, poll=POLL_INTERVAL):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    return WebDriverWait(driver, timeout, poll_frequency=poll).until(condition)
@@ -0,0 +1,58 @@
+import logging
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.25
+
+
+def iter_tasks(executor, func, tasks, task_timeout=None, on_timeout=None):
+    """מריץ את func על כל משימה במקביל ומחזיר (אינדקס, תוצאה) לפי סדר הסיום.
+
+    משימה שרצה יותר מ-task_timeout שניות מוחלפת בתוצאה של on_timeout(task),
+    כך שהדף מוצג עם תוצאה חלקית במקום להיכשל כולו.
+    """
+    started = {}
+    lock = threading.Lock()
+
+    def run(i, task):
+        with lock:
+            started[i] = time.monotonic()
+        return func(task)
+
+    futures = {executor.submit(run, i, task): i for i, task in enumerate(tasks)}
+    pending = set(futures)
+
+    while pending:
+        done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+        for future in done:
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"שגיאה במשימה {tasks[i]}: {str(e)}")
+                result = on_timeout(tasks[i]) if on_timeout else []
+            yield i, result
+
+        if task_timeout is None:
+            continue
+        now = time.monotonic()
+        for future in list(pending):
+            i = futures[future]
+            with lock:
+                start = started.get(i)
+            if start is not None and now - start > task_timeout:
+                # המשימה ממשיכה ברקע ותעדכן את הקאש כשתסתיים
+                logger.warning(f"משימה {tasks[i]} חרגה מ-{task_timeout} שניות, מחזיר תוצאה חלקית")
+                pending.discard(future)
+                yield i, on_timeout(tasks[i]) if on_timeout else []
+
+
+def run_tasks(executor, func, tasks, task_timeout=None, on_timeout=None):
+    """כמו iter_tasks, אבל מחכה לכל המשימות ומחזיר את התוצאות בסדר המשימות המקורי"""
+    results = [None] * len(tasks)
+    for i, result in iter_tasks(executor, func, tasks, task_timeout, on_timeout):
+        results[i] = result
+    return results
@@ -0,0 +1,161 @@
+import os
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def parse_hours(spec):
+    """ממיר מחרוזת כמו '0-7' או '22-6' לקבוצת שעות"""
+    start, end = (int(part) for part in spec.split('-'))
+    if start <= end:
+        return set(range(start, end + 1))
+    return set(range(start, 24)) | set(range(0, end + 1))
+
+
+def days_ahead(dates, now):
+    """רשימת תאריכים (dd/mm/yyyy) כמספרי ימים מהיום, בלי תאריכים שעברו"""
+    today = now.date()
+    offsets = sorted({(datetime.strptime(date, '%d/%m/%Y').date() - today).days for date in dates})
+    return [offset for offset in offsets if offset >= 0]
+
+
+class QueryLog:
+    """לוג חיפושים (JSON lines) לפי כמה ימים קדימה חיפשו, לחישוב אילו תאריכים פופולריים.
+
+    לתהליך יחיד: הרשומות נקראות מהקובץ רק בעלייה. כשכמה עובדים מחפשים - SharedQueryLog.
+    """
+
+    def __init__(self, path, window_days=30):
+        self.path = path
+        self.window = timedelta(days=window_days)
+        self._records = deque()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        cutoff = datetime.now() - self.window
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        searched_at = datetime.strptime(record['ts'], '%Y-%m-%d %H:%M:%S')
+                    except (ValueError, KeyError):
+                        continue
+                    if searched_at >= cutoff:
+                        self._records.append((searched_at, record['days_ahead']))
+        except OSError as e:
+            logger.error(f"שגיאה בקריאת לוג החיפושים: {str(e)}")
+            return
+        # דחיסת הקובץ: רק רשומות מתוך החלון נשארות
+        self._rewrite()
+
+    def _rewrite(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for searched_at, days_ahead in self._records:
+                    f.write(json.dumps({'ts': searched_at.strftime('%Y-%m-%d %H:%M:%S'), 'days_ahead': days_ahead}) + '\n')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"שגיאה בדחיסת לוג החיפושים: {str(e)}")
+
+    def record(self, dates):
+        """רושם חיפוש של רשימת תאריכים (dd/mm/yyyy) כמספר ימים מהיום"""
+        now = datetime.now()
+        offsets = days_ahead(dates, now)
+        if not offsets:
+            return
+        with self._lock:
+            self._records.append((now, offsets))
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'ts': now.strftime('%Y-%m-%d %H:%M:%S'), 'days_ahead': offsets}) + '\n')
+            except OSError as e:
+                logger.error(f"שגיאה בכתיבה ללוג החיפושים: {str(e)}")
+
+    def frequencies(self):
+        cutoff = datetime.now() - self.window
+        counts = Counter()
+        with self._lock:
+            while self._records and self._records[0][0] < cutoff:
+                self._records.popleft()
+            for _, days_ahead in self._records:
+                counts.update(days_ahead)
+        return counts
+
+
+class Prewarmer:
+    """שומר את הימים הקרובים חמים בקאש: רץ בשעות שקטות, בקצב מוגבל, ומרענן ימים פופולריים יותר"""
+
+    def __init__(self, refresh, tasks_for_date, cache_age, query_log, horizon_days=14,
+                 active_hours=None, min_gap=20.0, base_interval=timedelta(hours=1),
+                 max_interval=timedelta(hours=6), tick=60.0):
+        self.refresh = refresh
+        self.tasks_for_date = tasks_for_date
+        self.cache_age = cache_age
+        self.query_log = query_log
+        self.horizon_days = horizon_days
+        self.active_hours = active_hours if active_hours is not None else set(range(24))
+        self.min_gap = min_gap
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.tick = tick
+        self._stop = threading.Event()
+        self._last_scrape = 0.0
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name='prewarm', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh_interval(self, offset, frequencies):
+        """ימים שמחפשים הרבה מתרעננים כל base_interval, ימים שלא מחפשים כמעט - כל max_interval"""
+        top = max(frequencies.values(), default=0)
+        if not top:
+            return self.max_interval
+        weight = frequencies.get(offset, 0) / top
+        return self.base_interval + (self.max_interval - self.base_interval) * (1 - weight)
+
+    def plan(self, now=None):
+        """רשימת משימות שצריך לרענן כעת, מהיום הפופולרי ביותר לפחות פופולרי"""
+        now = now or datetime.now()
+        frequencies = self.query_log.frequencies()
+        offsets = sorted(range(self.horizon_days), key=lambda offset: (-frequencies.get(offset, 0), offset))
+        due = []
+        for offset in offsets:
+            date = (now + timedelta(days=offset)).strftime('%d/%m/%Y')
+            interval = self.refresh_interval(offset, frequencies)
+            for task in self.tasks_for_date(date):
+                age = self.cache_age(task)
+                if age is None or age >= interval:
+                    due.append(task)
+        return due
+
+    def run(self):
+        while not self._stop.is_set():
+            if datetime.now().hour in self.active_hours:
+                for task in self.plan():
+                    if self._stop.is_set() or datetime.now().hour not in self.active_hours:
+                        break
+                    # הגבלת קצב: לא יותר מגרידה אחת כל min_gap שניות
+                    wait = self._last_scrape + self.min_gap - time.monotonic()
+                    if wait > 0 and self._stop.wait(wait):
+                        break
+                    self._last_scrape = time.monotonic()
+                    try:
+                        logger.debug(f"חימום קאש: {task}")
+                        self.refresh(task)
+                    except Exception as e:
+                        logger.error(f"שגיאה בחימום הקאש עבור {task}: {str(e)}")
+            self._stop.wait(self.tick)
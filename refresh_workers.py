@@ -0,0 +1,49 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshWorkers:
+    """עובדי רקע שמרעננים רשומות קאש ישנות; בקשות כפולות לאותו מפתח מתאחדות לרענון אחד"""
+
+    def __init__(self, refresh, workers=1, max_pending=500):
+        self.refresh = refresh
+        self.max_pending = max_pending
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f'cache-refresh-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, args):
+        """מכניס רענון לתור; מחזיר False אם אותו מפתח כבר ממתין או מתרענן"""
+        with self._lock:
+            if key in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                logger.warning(f"תור הרענון מלא, מדלג על {key}")
+                return False
+            self._pending.add(key)
+        self._queue.put((key, args))
+        logger.debug(f"רענון ברקע נוסף לתור: {key}")
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            key, args = self._queue.get()
+            try:
+                self.refresh(args)
+            except Exception as e:
+                logger.error(f"שגיאה ברענון ברקע של {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
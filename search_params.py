@@ -0,0 +1,91 @@
+"""פרמטרי חיפוש: מסלולים, נוסעים ויום-מסלול (SearchTask) שעליו עובדים הקאש, המעקב וההזמנה."""
+import re
+from collections import namedtuple
+
+Passengers = namedtuple('Passengers', ['adults', 'children', 'infants', 'eilat_resident'])
+DEFAULT_PASSENGERS = Passengers(1, 0, 0, True)
+MAX_PASSENGERS = 9
+
+SearchTask = namedtuple('SearchTask', ['date', 'origin', 'destination', 'direction', 'passengers'],
+                        defaults=(DEFAULT_PASSENGERS,))
+
+DIRECTIONS = ("הלוך", "חזור")
+
+_PASSENGERS_RE = re.compile(r'^p(\d+)-(\d+)-(\d+)(-nr)?$')
+
+
+def parse_routes(spec):
+    """'ETM-TLV,ETM-HFA' -> [('ETM', 'TLV'), ('ETM', 'HFA')]; ValueError עם הודעה למשתמש על מחרוזת לא תקינה"""
+    routes = []
+    for part in spec.split(','):
+        codes = [code.strip().upper() for code in part.split('-')]
+        if len(codes) != 2 or not all(code.isalpha() for code in codes):
+            raise ValueError("מסלול לא תקין")
+        routes.append(tuple(codes))
+    return routes
+
+
+def make_passengers(adults=1, children=0, infants=0, eilat_resident=True):
+    """בודק טווחים ומחזיר Passengers; ValueError עם הודעה למשתמש על ערכים לא תקינים"""
+    try:
+        adults, children, infants = int(adults), int(children), int(infants)
+    except (TypeError, ValueError):
+        raise ValueError("מספר נוסעים לא תקין") from None
+    if adults < 1 or children < 0 or infants < 0 or infants > adults or adults + children > MAX_PASSENGERS:
+        raise ValueError("מספר נוסעים לא תקין")
+    return Passengers(adults, children, infants, bool(eilat_resident))
+
+
+def passengers_suffix(passengers):
+    """חלק המפתח שמייצג את הנוסעים; ריק עבור ברירת המחדל כדי שמפתחות קיימים לא ישתנו"""
+    if passengers == DEFAULT_PASSENGERS:
+        return ''
+    suffix = f"p{passengers.adults}-{passengers.children}-{passengers.infants}"
+    return suffix if passengers.eilat_resident else suffix + '-nr'
+
+
+def parse_passengers_suffix(text):
+    match = _PASSENGERS_RE.match(text)
+    if not match:
+        return None
+    return Passengers(int(match.group(1)), int(match.group(2)), int(match.group(3)), match.group(4) is None)
+
+
+def task_key(task):
+    """מפתח הקאש של יום-מסלול: date_origin_destination_direction[_pA-C-I[-nr]]"""
+    key = f"{task.date}_{task.origin}_{task.destination}_{task.direction}"
+    suffix = passengers_suffix(task.passengers)
+    return f"{key}_{suffix}" if suffix else key
+
+
+def parse_task_key(key):
+    date, origin, destination, direction, *rest = key.split('_')
+    passengers = parse_passengers_suffix(rest[0]) if rest else None
+    if rest and passengers is None:
+        raise ValueError(f"מפתח לא תקין: {key}")
+    return SearchTask(date, origin, destination, direction, passengers or DEFAULT_PASSENGERS)
+
+
+def results_query(task):
+    """פרמטרי ה-URL של דף התוצאות; בברירת המחדל זהים לכתובת המקורית.
+
+    adults/children/infants הם ניחוש שעוד לא אומת מול האתר, ולכן app.py לא מחפש
+    עם מספר נוסעים אחר בלי PASSENGER_COUNTS=1.
+    """
+    passengers = task.passengers
+    query = f"origin={task.origin}&destination={task.destination}&startDate={task.date}&eilatResident={int(passengers.eilat_resident)}"
+    if passengers[:3] != DEFAULT_PASSENGERS[:3]:
+        query += f"&adults={passengers.adults}&children={passengers.children}&infants={passengers.infants}"
+    return query
+
+
+def build_search_tasks(dates, routes, directions=DIRECTIONS, passengers=DEFAULT_PASSENGERS):
+    """כל צירופי תאריך x מסלול x כיוון; הכיוון 'חזור' הוא המסלול ההפוך"""
+    tasks = []
+    for date_str in dates:
+        for origin, destination in routes:
+            if "הלוך" in directions:
+                tasks.append(SearchTask(date_str, origin, destination, "הלוך", passengers))
+            if "חזור" in directions:
+                tasks.append(SearchTask(date_str, destination, origin, "חזור", passengers))
+    return tasks
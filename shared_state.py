@@ -0,0 +1,436 @@
+"""מצב שמשותף לבקשות: רשימת המעקב, הזרם של השינויים בה והחיפוש האחרון של כל סשן.
+
+שני מימושים עם אותו ממשק:
+- Watchlist / LastSearches בזיכרון, לתהליך יחיד (app.run).
+- SharedWatchlist / SharedChangeFeed / SharedLastSearches / SharedQueryLog ב-SQLite (WAL), כשכמה
+  עובדי gunicorn צריכים לראות אותה רשימה. LeaderLock דואג שרק אחד מהם מריץ את המעקב.
+"""
+import os
+import json
+import time
+import fcntl
+import sqlite3
+import logging
+import secrets
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+from change_feed import ChangeFeed
+from prewarm import days_ahead
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS watchlist (
+    flight_key TEXT PRIMARY KEY,
+    flight TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watch_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    version INTEGER NOT NULL,
+    flight_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_watch_changes_version ON watch_changes (version);
+
+CREATE TABLE IF NOT EXISTS last_searches (
+    search_id TEXT PRIMARY KEY,
+    flights TEXT NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_last_searches_used_at ON last_searches (used_at);
+
+CREATE TABLE IF NOT EXISTS search_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    searched_at REAL NOT NULL,
+    days_ahead TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_log_searched_at ON search_log (searched_at);
+
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class Watchlist:
+    """רשימת המעקב בזיכרון התהליך; כל שינוי מתפרסם ב-feed.
+
+    אם ניתן path, הרשימה נטענת ממנו בעלייה ונכתבת אליו (באיחור של flush_interval)
+    אחרי כל שינוי, כך שהמעקב ממשיך מאותו מקום אחרי הפעלה מחדש.
+    """
+
+    def __init__(self, feed=None, path=None, flush_interval=2.0):
+        self.feed = feed or ChangeFeed()
+        self.path = path
+        self.flush_interval = flush_interval
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer = None
+        if path:
+            self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                flights = json.load(f)
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logger.error(f"שגיאה בקריאת רשימת המעקב השמורה: {str(e)}, מתחיל עם רשימה ריקה")
+            return
+        if not isinstance(flights, dict):
+            logger.warning("קובץ רשימת המעקב פגום, מתחיל עם רשימה ריקה")
+            return
+        with self._lock:
+            self._flights.update((key, flight) for key, flight in flights.items() if isinstance(flight, dict))
+        logger.info(f"נטענו {len(self._flights)} טיסות במעקב מ-{self.path}")
+
+    def _schedule_flush(self):
+        if not self.path:
+            return
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """כותב את הרשימה לדיסק באופן אטומי (קובץ זמני + rename)"""
+        if not self.path:
+            return
+        with self._write_lock:
+            with self._lock:
+                self._flush_timer = None
+                if not self._dirty:
+                    return
+                snapshot = json.dumps(self._flights, ensure_ascii=False)
+                self._dirty = False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.watchlist.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"שגיאה בשמירת רשימת המעקב: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._schedule_flush()
+
+    def __contains__(self, key):
+        return key in self._flights
+
+    def __len__(self):
+        return len(self._flights)
+
+    def get(self, key):
+        return self._flights.get(key)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._flights)
+
+    def add(self, key, flight):
+        """מחזיר False אם הטיסה כבר במעקב"""
+        with self._lock:
+            if key in self._flights:
+                return False
+            self._flights[key] = flight
+            self._schedule_flush()
+        self.feed.publish(key)
+        return True
+
+    def remove(self, key):
+        with self._lock:
+            if self._flights.pop(key, None) is None:
+                return False
+            self._schedule_flush()
+        self.feed.publish(key)
+        return True
+
+    def save(self, flights, changed=()):
+        """שומר טיסות מעודכנות (רק כאלה שעדיין במעקב) ומפרסם את changed"""
+        with self._lock:
+            for key, flight in flights.items():
+                if key in self._flights:
+                    self._flights[key] = flight
+                    self._schedule_flush()
+        if changed:
+            self.feed.publish(*changed)
+
+
+class LastSearches:
+    """תוצאות החיפוש האחרון לכל סשן, עם תקרה על מספר הסשנים שנשמרים"""
+
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, search_id):
+        with self._lock:
+            if search_id not in self._entries:
+                return None
+            self._entries.move_to_end(search_id)
+            return self._entries[search_id]
+
+    def put(self, search_id, flights):
+        with self._lock:
+            self._entries[search_id] = flights
+            self._entries.move_to_end(search_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SharedStore:
+    """קובץ SQLite אחד לכל המצב המשותף; חיבור לכל שרשור, כמו ב-FlightStore"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # autocommit; הטרנזקציות נפתחות במפורש ב-transaction()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE: נעילת כתיבה מההתחלה, כדי שקריאה-ואז-כתיבה תהיה אטומית בין תהליכים"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    def secret_key(self):
+        """מפתח סשן משותף לכל העובדים; נוצר בפעם הראשונה ונשמר בקובץ"""
+        with self.transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)',
+                         ('secret_key', secrets.token_hex(32)))
+            return conn.execute("SELECT value FROM settings WHERE name = 'secret_key'").fetchone()[0]
+
+    def counter(self, name):
+        """מונה משותף (למשל דור הקאש); 0 אם עוד לא הוגדל"""
+        rows = self.query('SELECT value FROM settings WHERE name = ?', (name,))
+        return int(rows[0][0]) if rows else 0
+
+    def increment(self, name):
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO settings (name, value) VALUES (?, '1') "
+                         "ON CONFLICT (name) DO UPDATE SET value = CAST(value AS INTEGER) + 1", (name,))
+            return int(conn.execute('SELECT value FROM settings WHERE name = ?', (name,)).fetchone()[0])
+
+
+class SharedChangeFeed:
+    """אותו ממשק כמו ChangeFeed, על טבלה משותפת; wait דוגם את הגרסה כי אין תנאי בין תהליכים"""
+
+    def __init__(self, store, max_keys=1000, poll_interval=0.5):
+        self.store = store
+        self.max_keys = max_keys
+        self.poll_interval = poll_interval
+
+    @property
+    def version(self):
+        return self.store.query('SELECT COALESCE(MAX(version), 0) FROM watch_changes')[0][0]
+
+    def publish(self, *keys):
+        with self.store.transaction() as conn:
+            return self.publish_in(conn, keys)
+
+    def publish_in(self, conn, keys):
+        """מפרסם בתוך טרנזקציה פתוחה, יחד עם השינוי עצמו"""
+        version = conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM watch_changes').fetchone()[0]
+        # שורה בלי מפתח כשאין מפתחות, כדי שכל גרסה תופיע בטבלה
+        conn.executemany('INSERT INTO watch_changes (version, flight_key) VALUES (?, ?)',
+                         [(version, key) for key in keys] or [(version, None)])
+        conn.execute('DELETE FROM watch_changes WHERE id <= (SELECT MAX(id) FROM watch_changes) - ?', (self.max_keys,))
+        return version
+
+    def changes_since(self, version):
+        """מחזיר (גרסה נוכחית, מפתחות שהשתנו); None במקום מפתחות אם צריך לשלוח את כל הרשימה מחדש"""
+        conn = self.store._connection()
+        # קריאה עקבית של הגרסה ושל השינויים
+        conn.execute('BEGIN')
+        try:
+            current, oldest = conn.execute('SELECT COALESCE(MAX(version), 0), MIN(version) FROM watch_changes').fetchone()
+            # ייתכן שחלק מהשורות של oldest כבר נמחקו, אז רק ממנה והלאה אפשר לדעת מה השתנה
+            if version > current or (oldest is not None and version < oldest):
+                return current, None
+            rows = conn.execute(
+                'SELECT flight_key FROM watch_changes WHERE version > ? AND flight_key IS NOT NULL '
+                'GROUP BY flight_key ORDER BY MAX(id) DESC', (version,)
+            ).fetchall()
+            return current, [row[0] for row in rows]
+        finally:
+            conn.execute('COMMIT')
+
+    def wait(self, version, timeout):
+        """ממתין עד שהגרסה תעבור את version; מחזיר True אם היה שינוי"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.version != version:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class SharedWatchlist:
+    """רשימת המעקב ב-SQLite; get ו-snapshot מחזירים עותקים, ועדכונים נכתבים חזרה ב-save"""
+
+    def __init__(self, store, feed=None):
+        self.store = store
+        self.feed = feed or SharedChangeFeed(store)
+
+    def __contains__(self, key):
+        return bool(self.store.query('SELECT 1 FROM watchlist WHERE flight_key = ?', (key,)))
+
+    def __len__(self):
+        return self.store.query('SELECT COUNT(*) FROM watchlist')[0][0]
+
+    def get(self, key):
+        rows = self.store.query('SELECT flight FROM watchlist WHERE flight_key = ?', (key,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def snapshot(self):
+        return {key: json.loads(flight) for key, flight in self.store.query('SELECT flight_key, flight FROM watchlist')}
+
+    def add(self, key, flight):
+        with self.store.transaction() as conn:
+            cursor = conn.execute('INSERT OR IGNORE INTO watchlist (flight_key, flight) VALUES (?, ?)',
+                                  (key, json.dumps(flight, ensure_ascii=False)))
+            if not cursor.rowcount:
+                return False
+            self.feed.publish_in(conn, (key,))
+        return True
+
+    def remove(self, key):
+        with self.store.transaction() as conn:
+            if not conn.execute('DELETE FROM watchlist WHERE flight_key = ?', (key,)).rowcount:
+                return False
+            self.feed.publish_in(conn, (key,))
+        return True
+
+    def save(self, flights, changed=()):
+        """שומר טיסות מעודכנות (רק כאלה שעדיין במעקב - לא מחזיר טיסה שהוסרה בינתיים) ומפרסם את changed"""
+        with self.store.transaction() as conn:
+            conn.executemany('UPDATE watchlist SET flight = ? WHERE flight_key = ?',
+                             [(json.dumps(flight, ensure_ascii=False), key) for key, flight in flights.items()])
+            if changed:
+                self.feed.publish_in(conn, changed)
+
+
+class SharedLastSearches:
+    """החיפוש האחרון לכל סשן ב-SQLite, כדי שכל עובד יוכל להציג אותו"""
+
+    def __init__(self, store, max_entries=500):
+        self.store = store
+        self.max_entries = max_entries
+
+    def get(self, search_id):
+        rows = self.store.query('SELECT flights FROM last_searches WHERE search_id = ?', (search_id,))
+        if not rows:
+            return None
+        with self.store.transaction() as conn:
+            conn.execute('UPDATE last_searches SET used_at = ? WHERE search_id = ?', (time.time(), search_id))
+        return json.loads(rows[0][0])
+
+    def put(self, search_id, flights):
+        with self.store.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO last_searches (search_id, flights, used_at) VALUES (?, ?, ?)',
+                         (search_id, json.dumps(flights, ensure_ascii=False), time.time()))
+            conn.execute('DELETE FROM last_searches WHERE search_id NOT IN '
+                         '(SELECT search_id FROM last_searches ORDER BY used_at DESC LIMIT ?)', (self.max_entries,))
+
+
+class SharedQueryLog:
+    """אותו ממשק כמו prewarm.QueryLog, בטבלה משותפת: המוביל מחמם לפי החיפושים של כל העובדים"""
+
+    def __init__(self, store, window_days=30):
+        self.store = store
+        self.window = timedelta(days=window_days)
+
+    def record(self, dates):
+        now = datetime.now()
+        offsets = days_ahead(dates, now)
+        if not offsets:
+            return
+        with self.store.transaction() as conn:
+            conn.execute('INSERT INTO search_log (searched_at, days_ahead) VALUES (?, ?)',
+                         (now.timestamp(), json.dumps(offsets)))
+
+    def frequencies(self):
+        cutoff = (datetime.now() - self.window).timestamp()
+        with self.store.transaction() as conn:
+            conn.execute('DELETE FROM search_log WHERE searched_at < ?', (cutoff,))
+            rows = conn.execute('SELECT days_ahead FROM search_log').fetchall()
+        counts = Counter()
+        for (offsets,) in rows:
+            counts.update(json.loads(offsets))
+        return counts
+
+
+class LeaderLock:
+    """נעילת קובץ (flock) שרק תהליך אחד מחזיק; המערכת משחררת אותה כשהתהליך מת"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """ניסיון בלי המתנה; מחזיר True אם התהליך הזה הוא המוביל"""
+        if self._file is not None:
+            return True
+        f = open(self.path, 'a+')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def run_as_leader(lock, target, retry_interval=10):
+    """ממתין (בלולאה) עד שהנעילה מתפנה ואז מריץ את target; מתאים לשרשור רקע בכל עובד"""
+    while not lock.acquire():
+        time.sleep(retry_interval)
+    logger.info(f"התהליך {os.getpid()} מחזיק ב-{lock.path} ומריץ את המעקב")
+    target()
@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """מאחד קריאות מקבילות לאותו מפתח: הראשון מבצע, והשאר ממתינים לאותה תוצאה"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executions = 0
+        self._shared = 0
+
+    def do(self, key, fn):
+        """מחזיר (תוצאה, האם התוצאה שותפה מקריאה אחרת)"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._executions += 1
+            else:
+                self._shared += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executions': self._executions,
+                'saved': self._shared,
+                'in_flight': len(self._calls)
+            }
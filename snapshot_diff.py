@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+from flight_keys import MISSING_CODES
+
+SEATS_CHANGED = 'seats_changed'
+SOLD_OUT = 'sold_out'
+REOPENED = 'reopened'
+PRICE_UP = 'price_up'
+PRICE_DOWN = 'price_down'
+ADDED = 'added'
+REMOVED = 'removed'
+
+# before/after הם רשומות Flight (None עבור טיסה שנוספה/הוסרה); old/new הם הערכים כפי שמוצגים באתר
+FlightChange = namedtuple('FlightChange', ['kind', 'flight_code', 'before', 'after', 'old', 'new'])
+
+
+def _by_code(flights):
+    return {flight.flight_code: flight for flight in flights or () if flight.flight_code not in MISSING_CODES}
+
+
+def _seats_changed(before, after):
+    # לפי מספר המקומות; כשאחד הצדדים בלי מספר (למשל 'N/A') - לפי הטקסט
+    if before.seats is not None and after.seats is not None:
+        return before.seats != after.seats
+    return before.text('seats_left') != after.text('seats_left')
+
+
+def diff_flight(code, before, after):
+    """שינויים בין שתי גרסאות של אותה טיסה"""
+    changes = []
+    old_seats, new_seats = before.text('seats_left'), after.text('seats_left')
+    if not before.is_full and after.is_full:
+        changes.append(FlightChange(SOLD_OUT, code, before, after, old_seats, new_seats))
+    elif before.is_full and not after.is_full:
+        changes.append(FlightChange(REOPENED, code, before, after, old_seats, new_seats))
+    elif _seats_changed(before, after):
+        changes.append(FlightChange(SEATS_CHANGED, code, before, after, old_seats, new_seats))
+
+    old_price, new_price = before.price_agorot, after.price_agorot
+    if old_price is not None and new_price is not None and old_price != new_price:
+        kind = PRICE_UP if new_price > old_price else PRICE_DOWN
+        changes.append(FlightChange(kind, code, before, after, before.text('price'), after.text('price')))
+    return changes
+
+
+def diff_snapshots(previous, current):
+    """משווה שתי גרידות (רשימות Flight) של אותו יום-מסלול לפי קוד טיסה, במעבר אחד על כל צד"""
+    before = _by_code(previous)
+    changes = []
+    for code, after in _by_code(current).items():
+        old = before.pop(code, None)
+        if old is None:
+            changes.append(FlightChange(ADDED, code, None, after, None, after.text('seats_left')))
+        else:
+            changes.extend(diff_flight(code, old, after))
+    for code, old in before.items():
+        changes.append(FlightChange(REMOVED, code, old, None, old.text('seats_left'), None))
+    return changes
+
+
+def describe(change):
+    """טקסט קצר לאירוע, להתראות SMS"""
+    flight = change.after or change.before
+    route = flight.route
+    where = f"{change.flight_code} ב-{route.date} מ-{route.origin} ל-{route.destination} בשעה {flight.text('departure_time')}"
+    if change.kind == SOLD_OUT:
+        return f"הטיסה {where} נמכרה במלואה"
+    if change.kind == REOPENED:
+        return f"נפתחו מקומות בטיסה {where}: {change.new}"
+    if change.kind == SEATS_CHANGED:
+        return f"שינוי במספר המקומות בטיסה {where}: {change.old} -> {change.new}"
+    if change.kind == PRICE_UP:
+        return f"המחיר בטיסה {where} עלה: {change.old} -> {change.new}"
+    if change.kind == PRICE_DOWN:
+        return f"המחיר בטיסה {where} ירד: {change.old} -> {change.new}"
+    if change.kind == ADDED:
+        return f"טיסה חדשה {where}: {change.new}"
+    return f"הטיסה {where} כבר לא מופיעה באתר"
@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_monitor import MonitorService, SeatChangeEvent, StubSmsSender
+from monitor_scheduler import MonitorScheduler
+
+
+def wait_for(condition, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def make_service(groups=None, fetch_group=None, apply_result=None, sender=None, executor=None):
+    return MonitorService(
+        scheduler=MonitorScheduler(base_interval=60, jitter=0),
+        get_groups=lambda: groups or {},
+        fetch_group=fetch_group or (lambda group: []),
+        apply_result=apply_result or (lambda group, flight_keys, result: []),
+        interval_for_group=lambda group, flight_keys: 60,
+        sender=sender,
+        executor=executor,
+        idle_poll=0.05,
+        batch_window=0.05
+    )
+
+
+def start(service):
+    thread = threading.Thread(target=service.run_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_published_events_are_batched_into_one_sms():
+    sender = StubSmsSender()
+    service = make_service(sender=sender)
+    # אירוע שנשלח לפני שהשירות רץ נשמר עד שהוא מתחיל
+    service.publish([SeatChangeEvent('a', 'first')])
+    thread = start(service)
+    assert wait_for(lambda: service._loop is not None)
+    service.publish([SeatChangeEvent('b', 'second')])
+
+    assert wait_for(lambda: sender.sent)
+    service.stop()
+    thread.join(2)
+
+    assert sender.sent == ['first\nsecond']
+    assert not thread.is_alive()
+
+
+def test_check_results_reach_the_notifier():
+    sender = StubSmsSender()
+    checked = []
+
+    def apply_result(group, flight_keys, result):
+        checked.append((group, flight_keys, result))
+        return [SeatChangeEvent(key, f"{key}: {result}") for key in flight_keys]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        service = make_service(groups={'day': ['k1', 'k2']}, fetch_group=lambda group: f"{group}-result",
+                               apply_result=apply_result, sender=sender, executor=executor)
+        thread = start(service)
+        assert wait_for(lambda: sender.sent)
+        service.stop()
+        thread.join(2)
+
+    assert checked == [('day', ['k1', 'k2'], 'day-result')]
+    assert sender.sent == ['k1: day-result\nk2: day-result']
+
+
+def test_stop_cancels_checks_in_progress():
+    release = threading.Event()
+    started = threading.Event()
+
+    def fetch_group(group):
+        started.set()
+        release.wait(5)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        service = make_service(groups={'day': ['k1']}, fetch_group=fetch_group, executor=executor)
+        thread = start(service)
+        assert started.wait(2)
+        assert len(service._tasks) == 1
+
+        service.stop()
+        thread.join(2)
+        release.set()
+
+    assert not thread.is_alive()
+    assert service._tasks == set() and service._notifier is None
+    # אחרי העצירה אירועים חוזרים להמתין לריצה הבאה
+    service.publish([SeatChangeEvent('a', 'later')])
+    assert len(service._pending) == 1
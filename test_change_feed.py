@@ -0,0 +1,39 @@
+import threading
+
+from change_feed import ChangeFeed
+
+
+def test_changes_since_a_version():
+    feed = ChangeFeed()
+    start = feed.version
+    feed.publish('a')
+    middle = feed.publish('b', 'c')
+    feed.publish('a')
+
+    # כל מפתח פעם אחת, מהשינוי האחרון לראשון
+    assert feed.changes_since(start) == (3, ['a', 'c', 'b'])
+    assert feed.changes_since(middle) == (3, ['a'])
+    assert feed.changes_since(3) == (3, [])
+
+
+def test_unknown_cursor_asks_for_full_list():
+    feed = ChangeFeed(max_keys=2)
+    feed.publish('a')
+    feed.publish('b')
+    feed.publish('c')
+
+    # המפתח של גרסה 1 כבר נזרק, וגרסה מהעתיד (למשל אחרי הפעלה מחדש) לא מוכרת
+    assert feed.changes_since(0) == (3, None)
+    assert feed.changes_since(1) == (3, ['c', 'b'])
+    assert feed.changes_since(7) == (3, None)
+
+
+def test_wait_wakes_on_publish():
+    feed = ChangeFeed()
+
+    assert feed.wait(0, 0.05) is False
+    timer = threading.Timer(0.05, feed.publish, args=('a',))
+    timer.start()
+    assert feed.wait(0, 2) is True
+    assert feed.wait(0, 0) is True
+    timer.join()
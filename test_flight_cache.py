@@ -0,0 +1,122 @@
+import json
+from datetime import datetime, timedelta
+
+from flight_cache import FlightCache, TIMESTAMP_FORMAT
+from test_flight_model import flight
+
+HOUR = timedelta(hours=1)
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault('flush_interval', 60)
+    return FlightCache(str(tmp_path / 'flight_cache.json'), kwargs.pop('ttl', HOUR), **kwargs)
+
+
+def write_entry(tmp_path, key, age):
+    """קובץ קאש בפורמט הישן עם רשומה אחת בגיל נתון"""
+    stored_at = (datetime.now() - age).strftime(TIMESTAMP_FORMAT)
+    with open(tmp_path / 'flight_cache.json', 'w', encoding='utf-8') as f:
+        json.dump({key: {'timestamp': stored_at, 'data': [flight()]}}, f, ensure_ascii=False)
+
+
+def test_lookup_returns_copies(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('k', [flight()])
+
+    data, stale = cache.lookup('k')
+    data[0]['price'] = 'changed'
+
+    assert stale is False
+    assert cache.get('k') == [flight()]
+    assert cache.lookup('missing') == (None, False)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set('a', [flight()])
+    cache.set('b', [flight()])
+    cache.get('a')
+    cache.set('c', [flight()])
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_expired_entry_is_dropped(tmp_path):
+    write_entry(tmp_path, 'k', 2 * HOUR)
+    cache = make_cache(tmp_path)
+
+    assert cache.lookup('k') == (None, False)
+    assert len(cache) == 0
+
+
+def test_flush_writes_entries_that_load_back(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('k', [flight(), flight(flight_code='6H044', index=1)])
+    cache.flush()
+
+    reloaded = make_cache(tmp_path)
+
+    assert reloaded.get('k') == [flight(), flight(flight_code='6H044', index=1)]
+    assert reloaded.timestamp('k') == cache.timestamp('k')
+
+
+def test_clear_removes_file(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('k', [flight()])
+    cache.flush()
+
+    assert cache.clear() is True
+    assert cache.get('k') is None
+    assert not (tmp_path / 'flight_cache.json').exists()
+    assert cache.clear() is False
+
+
+def test_entry_past_soft_ttl_is_served_as_stale(tmp_path):
+    write_entry(tmp_path, 'old', 40 * timedelta(minutes=1))
+    cache = make_cache(tmp_path, ttl=24 * HOUR, soft_ttl=timedelta(minutes=30))
+    cache.set('new', [flight()])
+
+    data, stale = cache.lookup('old')
+    assert data == [flight()] and stale is True
+    assert cache.lookup('new') == ([flight()], False)
+
+    # רענון מחליף את הרשומה ומאפס את הגיל שלה
+    cache.set('old', [flight(price='₪120')])
+    assert cache.lookup('old') == ([flight(price='₪120')], False)
+
+
+def test_shared_file_keeps_entries_of_other_processes(tmp_path):
+    first = make_cache(tmp_path, shared_file=True)
+    second = make_cache(tmp_path, shared_file=True)
+    first.set('a', [flight()])
+    second.set('b', [flight(flight_code='6H044')])
+    first.flush()
+    second.flush()
+
+    reloaded = make_cache(tmp_path)
+    assert reloaded.get('a') == [flight()]
+    assert reloaded.get('b') == [flight(flight_code='6H044')]
+
+    # רשומה חדשה יותר של אותו מפתח גוברת על מה שבקובץ
+    first.set('b', [flight(price='₪120')])
+    first.flush()
+    second.flush()
+    assert make_cache(tmp_path).get('b') == [flight(price='₪120')]
+
+
+def test_reset_in_one_process_empties_the_others(tmp_path):
+    generation = {'value': 0}
+    first = make_cache(tmp_path, shared_file=True, generation=lambda: generation['value'])
+    second = make_cache(tmp_path, shared_file=True, generation=lambda: generation['value'])
+    first.set('a', [flight()])
+    second.set('b', [flight()])
+    first.flush()
+
+    generation['value'] += 1
+    first.clear()
+
+    assert second.get('b') is None
+    second.flush()
+    assert not (tmp_path / 'flight_cache.json').exists()
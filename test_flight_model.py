@@ -0,0 +1,91 @@
+import json
+
+from flight_model import Flight, dump_flights, load_flights
+from snapshot_diff import diff_snapshots, SEATS_CHANGED, PRICE_DOWN, SOLD_OUT, ADDED, REMOVED
+from test_flight_parser import parse, read_fixture
+
+
+def flight(**fields):
+    base = {
+        'direction': 'הלוך',
+        'date': '23/03/2025',
+        'departure_time': '23:30',
+        'arrival_time': '00:30',
+        'price': '₪1,099',
+        'seats_left': 'נותרו 7 מקומות',
+        'duration': '1:00 שעות',
+        'flight_code': '6H042',
+        'airline': 'ישראייר',
+        'origin': 'ETM',
+        'destination': 'TLV',
+        'index': 0,
+        'booking_url': None,
+        'last_checked': '10:00:00',
+        'changed': False,
+        'is_full': False
+    }
+    base.update(fields)
+    return base
+
+
+def round_trip(flights):
+    """דרך הייצוג הקומפקטי ודרך JSON, כמו בכתיבה לקובץ הקאש וטעינה ממנו"""
+    compact = json.loads(json.dumps(dump_flights([Flight.from_dict(f) for f in flights]), ensure_ascii=False))
+    return [record.to_dict() for record in load_flights(compact)]
+
+
+def test_parsed_page_round_trips():
+    flights = parse(read_fixture('debug_page_after_selection.html'))
+
+    assert [Flight.from_dict(f).to_dict() for f in flights] == flights
+    assert round_trip(flights) == flights
+
+
+def test_numeric_fields_without_raw():
+    record = Flight.from_dict(flight())
+
+    assert record.raw is None
+    assert record.price_agorot == 109900
+    assert record.seats == 7
+    assert record.duration_minutes == 60
+    # נחיתה אחרי חצות
+    assert record.arrival.day == 24
+    assert record.text('price') == '₪1,099'
+
+
+def test_unparsed_text_kept_in_raw():
+    placeholder = flight(departure_time='אין טיסות', arrival_time='N/A', price='N/A', seats_left='N/A',
+                         duration='N/A', flight_code='N/A', airline='N/A')
+    odd = flight(price='₪099', seats_left='נותרו מקומות אחרונים', is_full=None, extra={'a': 1})
+
+    assert Flight.from_dict(placeholder).raw == {'departure_time': 'אין טיסות', 'price': 'N/A'}
+    assert Flight.from_dict(odd).text('seats_left') == 'נותרו מקומות אחרונים'
+    assert round_trip([placeholder, odd]) == [placeholder, odd]
+
+
+def test_missing_fields_stay_missing():
+    partial = flight()
+    del partial['booking_url'], partial['price']
+    record = Flight.from_dict(partial)
+
+    assert record.raw == {'_missing': ['price', 'booking_url']}
+    assert record.text('price') is None
+    assert 'price' not in record.to_dict() and 'booking_url' not in record.to_dict()
+    assert round_trip([partial]) == [partial]
+
+
+def test_diff_uses_numeric_fields():
+    before = [Flight.from_dict(flight()), Flight.from_dict(flight(flight_code='6H044', index=1))]
+    after = [Flight.from_dict(flight(seats_left='נותרו 3 מקומות', price='₪999')),
+             Flight.from_dict(flight(flight_code='6H046', index=1, seats_left='טיסה מלאה', is_full=True))]
+
+    changes = diff_snapshots(before, after)
+
+    assert [(change.kind, change.flight_code, change.old, change.new) for change in changes] == [
+        (SEATS_CHANGED, '6H042', 'נותרו 7 מקומות', 'נותרו 3 מקומות'),
+        (PRICE_DOWN, '6H042', '₪1,099', '₪999'),
+        (ADDED, '6H046', None, 'טיסה מלאה'),
+        (REMOVED, '6H044', 'נותרו 7 מקומות', None),
+    ]
+    sold_out = diff_snapshots([Flight.from_dict(flight())], [Flight.from_dict(flight(seats_left='טיסה מלאה', is_full=True))])
+    assert [change.kind for change in sold_out] == [SOLD_OUT]
@@ -0,0 +1,90 @@
+import os
+
+from flight_parser import find_cards, parse_flight_cards
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CARD_TEMPLATE = '''
+<div class="flight-result-item-card--domestic">
+  <div class="flight-text-block flight-text-block--powered-by">
+    <div class="flight-text-block__top-text flight-text-block__top-text--powered-by">ישראייר [{code}]</div>
+    <div class="flight-text-block__bottom-text flight-text-block__bottom-text--powered-by">מופעלת ע״י <span class="dib">ישראייר</span></div>
+  </div>
+  <div class="flight-text-block flight-text-block--primary"><div class="flight-text-block__bottom-text flight-text-block__bottom-text--primary">07:30</div></div>
+  <div class="flight-text-block flight-text-block--primary"><div class="flight-text-block__bottom-text flight-text-block__bottom-text--primary">08:30</div></div>
+  <div class="flight-text-block flight-text-block--sm flight-text-block--primary"><div class="flight-text-block__top-text flight-text-block__top-text--primary">1:00 שעות</div></div>
+  {price}
+  <div class="purchase-block-button-group__top"><span>{seats}</span></div>
+  <button class="purchase-block-button-group__button" {button_attrs}><span>בחירה</span></button>
+</div>
+'''
+
+PRICE_BLOCK = '<div class="flight-result-price__top flight-result-price__top--domestic"><span>מחיר משוקלל לאדם</span><span>₪129</span></div>'
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def parse(html):
+    return parse_flight_cards(html, '23/03/2025', 'ETM', 'TLV', 'הלוך', '10:00:00')
+
+
+def test_parses_saved_results_page():
+    flights = parse(read_fixture('debug_page_after_selection.html'))
+
+    assert [flight['flight_code'] for flight in flights] == ['6H042', '6H044', '6H048']
+    assert [flight['index'] for flight in flights] == [0, 1, 2]
+    assert flights[0] == {
+        'direction': 'הלוך',
+        'date': '23/03/2025',
+        'departure_time': '08:15',
+        'arrival_time': '09:15',
+        'price': '₪99',
+        'seats_left': 'נותרו 7 מקומות',
+        'duration': '1:00 שעות',
+        'flight_code': '6H042',
+        'airline': 'ישראייר',
+        'origin': 'ETM',
+        'destination': 'TLV',
+        'index': 0,
+        'booking_url': None,
+        'last_checked': '10:00:00',
+        'changed': False,
+        'is_full': False
+    }
+
+
+def test_pages_without_cards_return_nothing():
+    assert parse(read_fixture('debug_html_error.html')) == []
+    assert parse(read_fixture('next_page.html')) == []
+
+
+def test_booking_url_and_full_flight():
+    html = CARD_TEMPLATE.format(code='6H043', price=PRICE_BLOCK, seats='מלאה', button_attrs='data-deal-id="abc123"')
+    flight, = parse(html)
+
+    assert flight['price'] == '₪129'
+    assert flight['seats_left'] == 'טיסה מלאה'
+    assert flight['is_full'] is True
+    assert flight['booking_url'] == 'https://www.israir.co.il/reservation/deal/searchDomesticFlight/he/abc123'
+
+
+def test_onclick_booking_url():
+    html = CARD_TEMPLATE.format(code='6H043', price=PRICE_BLOCK, seats='נותרו 2 מקומות',
+                                button_attrs="onclick=\"window.open('https://example.com/deal/1')\"")
+    flight, = parse(html)
+
+    assert flight['booking_url'] == 'https://example.com/deal/1'
+
+
+def test_card_missing_a_field_is_skipped():
+    html = (CARD_TEMPLATE.format(code='6H043', price='', seats='נותרו 2 מקומות', button_attrs='') +
+            CARD_TEMPLATE.format(code='6H045', price=PRICE_BLOCK, seats='נותרו 2 מקומות', button_attrs=''))
+    flights = parse(html)
+
+    assert len(find_cards(html)) == 2
+    assert [flight['flight_code'] for flight in flights] == ['6H045']
+    assert flights[0]['index'] == 1
+
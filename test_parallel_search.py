@@ -0,0 +1,43 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from parallel_search import iter_tasks, run_tasks
+
+
+def test_results_keep_task_order():
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = run_tasks(executor, lambda task: (time.sleep(0.05 * (3 - task)), task * 10)[1], [0, 1, 2])
+
+    assert results == [0, 10, 20]
+
+
+def test_slow_task_is_replaced_after_timeout():
+    release = threading.Event()
+
+    def func(task):
+        if task == 'slow':
+            release.wait(5)
+        return f"{task}-ok"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        start = time.monotonic()
+        results = run_tasks(executor, func, ['fast', 'slow'], task_timeout=0.3,
+                            on_timeout=lambda task: f"{task}-timeout")
+        elapsed = time.monotonic() - start
+        release.set()
+
+    assert results == ['fast-ok', 'slow-timeout']
+    assert elapsed < 2
+
+
+def test_failed_task_uses_on_timeout_result():
+    def func(task):
+        if task == 'bad':
+            raise RuntimeError("boom")
+        return task
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = dict(iter_tasks(executor, func, ['good', 'bad'], on_timeout=lambda task: 'placeholder'))
+
+    assert results == {0: 'good', 1: 'placeholder'}
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return 'result'
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(single_flight.do, 'key', fetch) for _ in range(4)]
+        # כולם כבר ממתינים על אותה קריאה לפני שהיא מסתיימת
+        while single_flight.stats()['saved'] < 3:
+            pass
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == [1]
+    assert sorted(results) == [('result', False)] + [('result', True)] * 3
+    assert single_flight.stats() == {'executions': 1, 'saved': 3, 'in_flight': 0}
+
+
+def test_error_reaches_waiters_and_next_call_runs_again():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise RuntimeError("scrape failed")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(single_flight.do, 'key', fail)
+        while single_flight.stats()['in_flight'] == 0:
+            pass
+        waiter = executor.submit(single_flight.do, 'key', lambda: 'unused')
+        while single_flight.stats()['saved'] == 0:
+            pass
+        release.set()
+        for future in (leader, waiter):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert single_flight.do('key', lambda: 'fresh') == ('fresh', False)
+    assert single_flight.do('other', lambda: 'other') == ('other', False)